@@ -1,20 +1,111 @@
 # cli/client.py
 import asyncio
-import uuid
-from common.rpc import send_json, recv_json, recv_bytes
+import itertools
+import os
+import weakref
+from common.rpc import ConnectionPool, send_json, recv_json, recv_bytes, recv_bytes_into
 
+# O id só é ecoado pelo daemon: um contador basta (uuid4 custa um os.urandom por chamada).
+_next_id = itertools.count(1).__next__
+_ID_PREFIX = f"{os.getpid():x}-"
 
-async def _open_socket(sock):
-    return await asyncio.open_unix_connection(sock)
+# Um conjunto de pools por event loop: conexões não podem cruzar loops.
+_POOLS = weakref.WeakKeyDictionary()
 
+# Comandos que podem ser reenviados se a conexão cair depois do pedido já
+# escrito: o daemon pode tê-lo executado, então só os que não alteram estado.
+_RETRY_SAFE_CMDS = frozenset(
+    {
+        "hello",
+        "torrents",
+        "config",
+        "status",
+        "status-all",
+        "cache-size",
+        "list",
+        "stat",
+        "file-info",
+        "read",
+        "read-batch",
+        "downloads",
+        "pinned",
+        "peers",
+        "peers-all",
+        "prefetch-info",
+        "infohash",
+        "torrent-info",
+        "trackers",
+        "tracker-status",
+    }
+)
 
-async def rpc_call(sock, payload, want_bytes=False):
+
+class _StaleConnection(Exception):
+    """Conexão reaproveitada caiu antes da resposta; o pedido pode ser repetido."""
+
+
+def _get_pool(sock) -> ConnectionPool:
+    pools = _POOLS.setdefault(asyncio.get_running_loop(), {})
+    pool = pools.get(sock)
+    if pool is None:
+        pool = pools[sock] = ConnectionPool(sock)
+    return pool
+
+
+async def close_pools():
+    pools = _POOLS.pop(asyncio.get_running_loop(), {})
+    for pool in pools.values():
+        await pool.close()
+
+
+async def _call(
+    pool, reader, writer, payload, want_bytes, sink, retry_unsent=False, retry_sent=False
+):
+    """
+    Um pedido/resposta numa conexão. Se ela cair antes do cabeçalho da
+    resposta, levanta _StaleConnection quando a repetição é permitida:
+    retry_unsent antes do pedido ser escrito, retry_sent depois.
+    """
+    sent = False
+    resp = None
+    try:
+        await send_json(writer, payload)
+        sent = True
+        resp = await recv_json(reader)
+
+        data = b""
+        if resp.get("ok") and resp.get("data_len", 0) > 0:
+            if sink is not None:
+                await recv_bytes_into(reader, resp["data_len"], sink)
+            elif want_bytes:
+                data = await recv_bytes(reader, resp["data_len"])
+            else:
+                # Bytes não lidos ficariam no stream: a conexão não volta ao pool.
+                writer.close()
+                return resp, data
+    except (ConnectionError, asyncio.IncompleteReadError) as e:
+        writer.close()
+        if resp is None and (retry_sent if sent else retry_unsent):
+            raise _StaleConnection() from e
+        raise
+    except BaseException:
+        # Falha ou cancelamento no meio da resposta: descarta a conexão.
+        writer.close()
+        raise
+
+    pool.release(reader, writer)
+    return resp, data
+
+
+async def _rpc(sock, payload, want_bytes=False, sink=None):
     sockets = sock if isinstance(sock, (list, tuple)) else [sock]
     last_err = None
-    reader = writer = None
+    pool = reader = writer = None
+    reused = False
     for candidate in sockets:
         try:
-            reader, writer = await _open_socket(candidate)
+            pool = _get_pool(candidate)
+            reader, writer, reused = await pool.acquire()
             last_err = None
             break
         except (FileNotFoundError, ConnectionRefusedError) as e:
@@ -24,15 +115,39 @@ async def rpc_call(sock, payload, want_bytes=False):
         raise last_err
     if reader is None or writer is None:
         raise ConnectionError("SocketUnavailable")
-    payload["id"] = payload.get("id", uuid.uuid4().hex)
+    if "id" not in payload:
+        payload["id"] = f"{_ID_PREFIX}{_next_id():x}"
 
-    await send_json(writer, payload)
-    resp = await recv_json(reader)
+    # Conexão ociosa pode ter sido fechada pelo daemon (ex.: reinício). Só se
+    # repete o pedido se nada da resposta chegou; com sink, nunca: parte dos
+    # bytes pode já ter sido entregue.
+    retry = reused and sink is None
+    try:
+        return await _call(
+            pool,
+            reader,
+            writer,
+            payload,
+            want_bytes,
+            sink,
+            retry_unsent=retry,
+            retry_sent=retry and payload.get("cmd") in _RETRY_SAFE_CMDS,
+        )
+    except _StaleConnection:
+        pass
+    # Tenta uma vez com conexão nova.
+    reader, writer = await asyncio.open_unix_connection(pool.path)
+    return await _call(pool, reader, writer, payload, want_bytes, sink)
 
-    data = b""
-    if want_bytes and resp.get("ok") and resp.get("data_len", 0) > 0:
-        data = await recv_bytes(reader, resp["data_len"])
 
-    writer.close()
-    await writer.wait_closed()
-    return resp, data
+async def rpc_call(sock, payload, want_bytes=False):
+    return await _rpc(sock, payload, want_bytes=want_bytes)
+
+
+async def rpc_call_stream(sock, payload, sink):
+    """
+    Como rpc_call(want_bytes=True), mas entrega os bytes da resposta a
+    `sink` em blocos, à medida que chegam. Retorna só o cabeçalho.
+    """
+    resp, _ = await _rpc(sock, payload, sink=sink)
+    return resp
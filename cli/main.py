@@ -1,7 +1,6 @@
 # cli/main.py
 import argparse
 import asyncio
-import math
 import os
 import json
 import sys
@@ -11,13 +10,24 @@ import binascii
 import urllib.parse
 import urllib.request
 import random
+from operator import itemgetter
 
 try:
     import libtorrent as lt
 except Exception:
     lt = None
 
-from cli.client import rpc_call
+try:
+    import uvloop
+except Exception:
+    uvloop = None
+
+try:
+    import orjson
+except Exception:
+    orjson = None
+
+from cli.client import close_pools, rpc_call, rpc_call_stream
 from plugins import get_plugin_for_uri
 from plugins.base import SourceError
 
@@ -25,6 +35,26 @@ DEFAULT_CONFIG_PATH = os.path.abspath(
     os.path.join(os.path.dirname(__file__), os.pardir, "config", "torrentfsd.json")
 )
 SYSTEM_CONFIG_PATH = "/etc/torrentfs/torrentfsd.json"
+LABELS_CACHE_TTL_S = 60.0
+
+# Divisores de unidade (--unit) como deslocamentos de bit: 1 << shift.
+_UNIT_SHIFTS = {"kb": 10, "mb": 20, "gb": 30}
+_UNIT_KEYS = ("downloaded", "uploaded", "download_rate", "upload_rate")
+
+# Extração em lote das linhas do comando downloads.
+_DL_STATUS_DEFAULTS = {
+    "name": "",
+    "peers": 0,
+    "seeds": 0,
+    "pieces_done": 0,
+    "pieces_total": 0,
+    "pieces_missing": 0,
+    "progress": 0,
+    "download_rate": 0,
+}
+_DL_STATUS_KEYS = itemgetter(*_DL_STATUS_DEFAULTS)
+_DL_FILE_DEFAULTS = {"path": "", "progress_pct": 0.0, "remaining": 0, "size": 0}
+_DL_FILE_KEYS = itemgetter(*_DL_FILE_DEFAULTS)
 
 
 def _find_config_path() -> str:
@@ -39,11 +69,21 @@ def _find_config_path() -> str:
     return DEFAULT_CONFIG_PATH
 
 
+def _json_loads(data: bytes):
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # NaN/Infinity e afins: o json da stdlib aceita
+            pass
+    return json.loads(data)
+
+
 def _load_trackers_from_config() -> list[str]:
     path = _find_config_path()
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        with open(path, "rb") as f:
+            data = _json_loads(f.read())
     except Exception:
         return []
     trackers = data.get("trackers", {}) if isinstance(data, dict) else {}
@@ -99,6 +139,33 @@ def _build_torrent_dir_map(torrents):
     return out
 
 
+def _write_all(fd: int, data) -> None:
+    # os.write pode gravar só parte dos bytes (pipes, terminais)
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view) :]
+
+
+def _scale_units(st: dict, unit: str) -> None:
+    d = 1 << _UNIT_SHIFTS[unit]
+    for key in _UNIT_KEYS:
+        st[key] = st.get(key, 0) / d
+
+
+def _build_scrape_url(tracker: str, ih_url: str) -> str:
+    parts = urllib.parse.urlsplit(tracker)
+    # Convenção de scrape: troca só o último segmento "announce*" por "scrape*".
+    head, _, last = parts.path.rpartition("/")
+    if last.startswith("announce"):
+        path = f"{head}/scrape{last[len('announce'):]}"
+    else:
+        path = parts.path.rstrip("/") + "/scrape"
+    query = urllib.parse.urlencode({"info_hash": urllib.parse.unquote_to_bytes(ih_url)})
+    if parts.query:
+        query = f"{parts.query}&{query}"
+    return urllib.parse.urlunsplit(parts._replace(path=path, query=query))
+
+
 def _normalize_path(path: str) -> str:
     if path in ("", "."):
         return ""
@@ -417,7 +484,12 @@ def main():
         "--chunk-size",
         type=int,
         default=1024 * 1024,
-        help="Tamanho do bloco de leitura (bytes)",
+        help="Tamanho do bloco de leitura (bytes); com blocos adaptativos, e o minimo",
+    )
+    p_cp.add_argument(
+        "--fixed-chunk",
+        action="store_true",
+        help="Nao adaptar o tamanho do bloco a vazao (usa sempre --chunk-size)",
     )
     p_cp.add_argument(
         "--read-timeout",
@@ -437,6 +509,24 @@ def main():
         default=0,
         help="Limite maximo de arquivos (0 = sem limite)",
     )
+    p_cp.add_argument(
+        "--concurrency",
+        type=int,
+        default=8,
+        help="Arquivos copiados em paralelo (diretorios)",
+    )
+    p_cp.add_argument(
+        "--pipeline-depth",
+        type=int,
+        default=16,
+        help="Blocos de leitura em voo por arquivo (no maximo pipeline-depth x chunk-size bytes)",
+    )
+    p_cp.add_argument(
+        "--batch-size",
+        type=int,
+        default=16,
+        help="Arquivos pequenos lidos por RPC read-batch (diretorios). Use 1 para desativar.",
+    )
     p_cp.add_argument(
         "--depth",
         type=int,
@@ -514,6 +604,12 @@ def main():
         default=-1,
         help="Profundidade maxima de diretórios (0 = só o path, -1 = ilimitado)",
     )
+    p_unpin_dir.add_argument(
+        "--concurrency",
+        type=int,
+        default=16,
+        help="RPCs em paralelo durante a varredura",
+    )
 
     # -----------------------------
     # pinned
@@ -537,6 +633,12 @@ def main():
         default=-1,
         help="Profundidade maxima de diretórios (0 = só o path, -1 = ilimitado)",
     )
+    p_prefetch.add_argument(
+        "--concurrency",
+        type=int,
+        default=16,
+        help="RPCs em paralelo durante a varredura",
+    )
 
     args = ap.parse_args()
     if not args.cmd:
@@ -615,6 +717,19 @@ def main():
                 msg += f"\t{client}"
             print(msg)
 
+        def _rank_peers(peers: list) -> list:
+            """
+            Retorna tuplas (up + down, up, down, peer) em ordem decrescente de atividade.
+            As taxas são convertidas uma vez por peer, não a cada uso.
+            """
+            ranked = []
+            for p in peers:
+                up = int(p.get("upload_rate", 0))
+                down = int(p.get("download_rate", 0))
+                ranked.append((up + down, up, down, p))
+            ranked.sort(key=itemgetter(0), reverse=True)
+            return ranked
+
         def _aliases_path() -> str:
             env = os.environ.get("TORRENTFS_ALIASES")
             if env:
@@ -625,8 +740,8 @@ def main():
         def _load_aliases() -> dict:
             path = _aliases_path()
             try:
-                with open(path, "r", encoding="utf-8") as f:
-                    data = json.load(f)
+                with open(path, "rb") as f:
+                    data = _json_loads(f.read())
             except FileNotFoundError:
                 return {}
             except Exception:
@@ -670,6 +785,46 @@ def main():
             dir_map = _build_torrent_dir_map(torrents)
             return {tid: name for name, tid in dir_map.items()}
 
+        def _labels_cache_path() -> str:
+            env = os.environ.get("TORRENTFS_LABELS_CACHE")
+            if env:
+                return env
+            home = os.path.expanduser("~")
+            return os.path.join(home, ".cache", "torrentfs", "labels.json")
+
+        async def _get_label_map() -> dict:
+            """
+            Mapa id -> rótulo, com cache em disco por LABELS_CACHE_TTL_S.
+            Evita o RPC "torrents" quando a CLI é chamada em loop por scripts.
+            """
+            path = _labels_cache_path()
+            sock_key = json.dumps(args.socket)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    cached = json.load(f)
+                if (
+                    cached.get("socket") == sock_key
+                    and time.time() - float(cached.get("ts", 0)) < LABELS_CACHE_TTL_S
+                    and isinstance(cached.get("labels"), dict)
+                ):
+                    return cached["labels"]
+            except Exception:
+                pass
+
+            resp_names, _ = await rpc_call(args.socket, {"cmd": "torrents"})
+            if not resp_names.get("ok"):
+                return {}
+            labels = _torrent_label_map(resp_names.get("torrents", []))
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp = f"{path}.{os.getpid()}.tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump({"socket": sock_key, "ts": time.time(), "labels": labels}, f)
+                os.replace(tmp, path)
+            except Exception:
+                pass
+            return labels
+
         def _infohash_hex_from_ti(ti) -> str:
             try:
                 ih = ti.info_hashes()
@@ -851,14 +1006,7 @@ def main():
             totals = resp.get("totals", {})
             torrents = resp.get("torrents", [])
             if not args.human and args.unit != "bytes":
-                divisors = {
-                    "kb": 1024,
-                    "mb": 1024 * 1024,
-                    "gb": 1024 * 1024 * 1024,
-                }
-                d = divisors[args.unit]
-                for key in ("downloaded", "uploaded", "download_rate", "upload_rate"):
-                    totals[key] = totals.get(key, 0) / d
+                _scale_units(totals, args.unit)
             if args.human:
                 totals["downloaded"] = _fmt_bytes(totals.get("downloaded", 0))
                 totals["uploaded"] = _fmt_bytes(totals.get("uploaded", 0))
@@ -1255,33 +1403,31 @@ def main():
             torrents = resp.get("torrents", [])
             for item in torrents:
                 tid = item.get("id", "")
-                st = item.get("status", {})
-                name = st.get("name", "")
-                peers = st.get("peers", 0)
-                seeds = st.get("seeds", 0)
-                pieces_done = st.get("pieces_done", 0)
-                pieces_total = st.get("pieces_total", 0)
-                pieces_missing = st.get("pieces_missing", 0)
-                progress = st.get("progress", 0)
-                rate = st.get("download_rate", 0)
+                st = {**_DL_STATUS_DEFAULTS, **item.get("status", {})}
+                (
+                    name,
+                    peers,
+                    seeds,
+                    pieces_done,
+                    pieces_total,
+                    pieces_missing,
+                    progress,
+                    rate,
+                ) = _DL_STATUS_KEYS(st)
                 print(
                     f"{tid}\t{name}\tpieces={pieces_done}/{pieces_total}\tmissing={pieces_missing}\t"
                     f"rate={rate}\tpeers={peers}\tseeds={seeds}\tprogress={progress}"
                 )
                 for f in item.get("files", []):
-                    fpath = f.get("path", "")
-                    pct = f.get("progress_pct", 0.0)
-                    remaining = f.get("remaining", 0)
-                    size = f.get("size", 0)
+                    fpath, pct, remaining, size = _DL_FILE_KEYS({**_DL_FILE_DEFAULTS, **f})
                     print(f"  file\t{pct:.2f}%\t{remaining}/{size}\t{fpath}")
             return
 
         if args.cmd == "uploads" and args.all_torrents:
-            label_map = {}
-            resp_names, _ = await rpc_call(args.socket, {"cmd": "torrents"})
-            if resp_names.get("ok"):
-                label_map = _torrent_label_map(resp_names.get("torrents", []))
-            resp, _ = await rpc_call(args.socket, {"cmd": "peers-all"})
+            label_map, (resp, _) = await asyncio.gather(
+                _get_label_map(),
+                rpc_call(args.socket, {"cmd": "peers-all"}),
+            )
             if args.json:
                 _print_json(resp)
                 return
@@ -1294,22 +1440,12 @@ def main():
                 st = item.get("status", {})
                 name = label_map.get(tid, st.get("name", ""))
                 peers = item.get("peers", [])
-                active = sum(
-                    1
-                    for p in peers
-                    if int(p.get("upload_rate", 0)) > 0 or int(p.get("download_rate", 0)) > 0
-                )
+                ranked = _rank_peers(peers)
+                active = sum(1 for _, up, down, _ in ranked if up > 0 or down > 0)
                 if not args.all and active == 0:
                     continue
                 _print_peers_summary(tid, name, peers)
-                peers_sorted = sorted(
-                    peers,
-                    key=lambda p: int(p.get("upload_rate", 0)) + int(p.get("download_rate", 0)),
-                    reverse=True,
-                )
-                for p in peers_sorted:
-                    up = int(p.get("upload_rate", 0))
-                    down = int(p.get("download_rate", 0))
+                for _, up, down, p in ranked:
                     if not args.all and up <= 0 and down <= 0:
                         continue
                     _print_peer_line(p)
@@ -1330,13 +1466,17 @@ def main():
             if not path:
                 return torrent_hint, path
 
-            abs_mount = os.path.abspath(args.mount) if args.mount else None
+            sep = os.sep
+            abspath = os.path.abspath
+            join = os.path.join
+            abs_mount = abspath(args.mount) if args.mount else None
             abs_path = path
             if not os.path.isabs(abs_path):
-                abs_path = os.path.abspath(os.path.join(os.getcwd(), path))
+                # abspath() já resolve relativo ao cwd; dispensa getcwd()+join().
+                abs_path = abspath(path)
 
             if abs_mount:
-                mount_prefix = abs_mount.rstrip(os.sep) + os.sep
+                mount_prefix = abs_mount.rstrip(sep) + sep
                 if abs_path != abs_mount and not abs_path.startswith(mount_prefix):
                     return torrent_hint, path
 
@@ -1352,22 +1492,21 @@ def main():
                 if torrent_hint:
                     return torrent_hint, _normalize_path(rel)
 
-                parts = rel.split(os.sep) if rel else []
+                parts = rel.split(sep) if rel else []
                 if parts and parts[0] in dir_map:
                     tid = dir_map[parts[0]]
-                    inner = os.path.join(*parts[1:]) if len(parts) > 1 else ""
+                    inner = join(*parts[1:]) if len(parts) > 1 else ""
                     return tid, _normalize_path(inner)
                 return None, _normalize_path(rel)
 
             # Sem --mount: tenta inferir pelo nome do torrent no caminho absoluto.
-            parts = abs_path.split(os.sep)
-            for idx, part in enumerate(parts):
-                if part in dir_map:
-                    tid = dir_map[part]
-                    inner = os.path.join(*parts[idx + 1 :]) if idx + 1 < len(parts) else ""
-                    return tid, _normalize_path(inner)
-
-            return torrent_hint, path
+            parts = abs_path.split(sep)
+            if dir_map.keys().isdisjoint(parts):
+                return torrent_hint, path
+            idx, part = next((i, p) for i, p in enumerate(parts) if p in dir_map)
+            tid = dir_map[part]
+            inner = join(*parts[idx + 1 :]) if idx + 1 < len(parts) else ""
+            return tid, _normalize_path(inner)
 
         if args.cmd == "status" and not args.torrent:
             resp, _ = await rpc_call(args.socket, {"cmd": "status-all"})
@@ -1387,9 +1526,19 @@ def main():
 
         torrent = await get_default_torrent(args.socket, torrent)
 
-        async def _walk_and_apply(path: str, max_files: int, max_depth: int, apply_fn):
+        async def _walk_and_apply(
+            path: str, max_files: int, max_depth: int, apply_fn, concurrency: int = 1
+        ):
+            """
+            Percorre `path` e aplica `apply_fn` em cada arquivo.
+            Subdiretórios e arquivos de um mesmo nível são processados em paralelo,
+            com no máximo `concurrency` RPCs em voo. Com --max-files, a ordem decide
+            quais arquivos entram: os irmãos são percorridos em sequência, na ordem
+            da árvore, e só aplicações bem-sucedidas contam para o limite.
+            """
             applied = 0
             errors = []
+            sem = asyncio.Semaphore(max(1, concurrency))
 
             def _join_path(parent: str, name: str) -> str:
                 if parent in ("", "/"):
@@ -1398,47 +1547,65 @@ def main():
                     return f"{parent}{name}"
                 return f"{parent}/{name}"
 
+            def _limit_reached() -> bool:
+                return max_files > 0 and applied >= max_files
+
             async def _apply_file(path: str) -> None:
                 nonlocal applied
-                if max_files > 0 and applied >= max_files:
+                if _limit_reached():
                     return
-                resp, _ = await apply_fn(path)
+                async with sem:
+                    resp, _ = await apply_fn(path)
                 if resp.get("ok"):
                     applied += 1
                 else:
                     errors.append({"path": path, "error": resp.get("error")})
 
             async def _walk(path: str, depth: int) -> None:
-                if max_files > 0 and applied >= max_files:
+                if _limit_reached():
                     return
-                resp, _ = await rpc_call(
-                    args.socket,
-                    {"cmd": "stat", "torrent": torrent, "path": path},
-                )
+                async with sem:
+                    resp, _ = await rpc_call(
+                        args.socket,
+                        {"cmd": "stat", "torrent": torrent, "path": path},
+                    )
                 if not resp.get("ok"):
                     errors.append({"path": path, "error": resp.get("error")})
                     return
 
                 st = resp.get("stat", {})
                 if st.get("type") == "dir":
-                    resp, _ = await rpc_call(
-                        args.socket,
-                        {"cmd": "list", "torrent": torrent, "path": path},
-                    )
+                    async with sem:
+                        resp, _ = await rpc_call(
+                            args.socket,
+                            {"cmd": "list", "torrent": torrent, "path": path},
+                        )
                     if not resp.get("ok"):
                         errors.append({"path": path, "error": resp.get("error")})
                         return
                     entries = resp.get("entries", [])
+                    if max_files > 0:
+                        for e in entries:
+                            if _limit_reached():
+                                return
+                            child = _join_path(path, e.get("name", ""))
+                            if e.get("type") == "dir":
+                                if max_depth >= 0 and depth >= max_depth:
+                                    continue
+                                await _walk(child, depth + 1)
+                            else:
+                                await _apply_file(child)
+                        return
+                    jobs = []
                     for e in entries:
-                        if max_files > 0 and applied >= max_files:
-                            return
                         child = _join_path(path, e.get("name", ""))
                         if e.get("type") == "dir":
                             if max_depth >= 0 and depth >= max_depth:
                                 continue
-                            await _walk(child, depth + 1)
+                            jobs.append(_walk(child, depth + 1))
                         else:
-                            await _apply_file(child)
+                            jobs.append(_apply_file(child))
+                    await asyncio.gather(*jobs)
                     return
 
                 await _apply_file(path)
@@ -1446,9 +1613,17 @@ def main():
             await _walk(path, 0)
             return applied, errors
 
-        async def _walk_files(path: str, max_files: int, max_depth: int):
-            files = []
+        async def _walk_files(path: str, max_files: int, max_depth: int, concurrency: int = 16):
+            """
+            Lista recursivamente os arquivos sob `path`, na ordem da árvore.
+            As listagens de diretórios irmãos correm em paralelo (até `concurrency`).
+            Com --max-files, a ordem decide quais arquivos entram: os irmãos são
+            percorridos em sequência, contando na ordem da árvore, e a varredura
+            para assim que o limite é atingido.
+            """
             errors = []
+            found = 0
+            sem = asyncio.Semaphore(max(1, concurrency))
 
             def _join_path(parent: str, name: str) -> str:
                 if parent in ("", "/"):
@@ -1457,47 +1632,67 @@ def main():
                     return f"{parent}{name}"
                 return f"{parent}/{name}"
 
-            async def _walk(path: str, depth: int) -> None:
-                if max_files > 0 and len(files) >= max_files:
-                    return
-                resp, _ = await rpc_call(
-                    args.socket,
-                    {"cmd": "stat", "torrent": torrent, "path": path},
-                )
+            def _limit_reached() -> bool:
+                return max_files > 0 and found >= max_files
+
+            async def _walk(path: str, depth: int) -> list:
+                nonlocal found
+                if _limit_reached():
+                    return []
+                async with sem:
+                    resp, _ = await rpc_call(
+                        args.socket,
+                        {"cmd": "stat", "torrent": torrent, "path": path},
+                    )
                 if not resp.get("ok"):
                     errors.append({"path": path, "error": resp.get("error")})
-                    return
+                    return []
 
                 st = resp.get("stat", {})
                 if st.get("type") == "dir":
                     if max_depth >= 0 and depth >= max_depth:
-                        return
-                    resp, _ = await rpc_call(
-                        args.socket,
-                        {"cmd": "list", "torrent": torrent, "path": path},
-                    )
+                        return []
+                    async with sem:
+                        resp, _ = await rpc_call(
+                            args.socket,
+                            {"cmd": "list", "torrent": torrent, "path": path},
+                        )
                     if not resp.get("ok"):
                         errors.append({"path": path, "error": resp.get("error")})
-                        return
+                        return []
                     entries = resp.get("entries", [])
+                    if max_files > 0:
+                        out = []
+                        for e in entries:
+                            if _limit_reached():
+                                break
+                            child = _join_path(path, e.get("name", ""))
+                            if e.get("type") == "dir":
+                                out.extend(await _walk(child, depth + 1))
+                            else:
+                                found += 1
+                                out.append({"path": child, "size": int(e.get("size", 0))})
+                        return out
+                    # Cada entrada vira uma lista; gather preserva a ordem original.
+                    parts = []
+                    subdirs = []
                     for e in entries:
-                        if max_files > 0 and len(files) >= max_files:
-                            return
                         child = _join_path(path, e.get("name", ""))
                         if e.get("type") == "dir":
-                            await _walk(child, depth + 1)
+                            parts.append(None)
+                            subdirs.append(_walk(child, depth + 1))
                         else:
-                            files.append(
-                                {
-                                    "path": child,
-                                    "size": int(e.get("size", 0)),
-                                }
-                            )
-                    return
+                            parts.append([{"path": child, "size": int(e.get("size", 0))}])
+                    sub_results = iter(await asyncio.gather(*subdirs))
+                    out = []
+                    for part in parts:
+                        out.extend(next(sub_results) if part is None else part)
+                    return out
 
-                files.append({"path": path, "size": int(st.get("size", 0))})
+                found += 1
+                return [{"path": path, "size": int(st.get("size", 0))}]
 
-            await _walk(path, 0)
+            files = await _walk(path, 0)
             return files, errors
 
         if args.cmd == "status":
@@ -1506,17 +1701,7 @@ def main():
                 {"cmd": "status", "torrent": torrent},
             )
             if resp.get("ok") and not args.human and args.unit != "bytes":
-                st = resp.get("status", {})
-                divisors = {
-                    "kb": 1024,
-                    "mb": 1024 * 1024,
-                    "gb": 1024 * 1024 * 1024,
-                }
-                d = divisors[args.unit]
-                st["downloaded"] = st.get("downloaded", 0) / d
-                st["uploaded"] = st.get("uploaded", 0) / d
-                st["download_rate"] = st.get("download_rate", 0) / d
-                st["upload_rate"] = st.get("upload_rate", 0) / d
+                _scale_units(resp.get("status", {}), args.unit)
             if args.json:
                 _print_json(resp)
                 return
@@ -1693,11 +1878,7 @@ def main():
             if not tracker.startswith("http"):
                 _print_error("scrape suporta apenas trackers HTTP/HTTPS")
                 return
-            if "/announce" in tracker:
-                scrape_url = tracker.replace("/announce", "/scrape")
-            else:
-                scrape_url = tracker.rstrip("/") + "/scrape"
-            url = f"{scrape_url}?info_hash={ih_url}"
+            url = _build_scrape_url(tracker, ih_url)
             try:
                 import bencodepy
             except Exception as e:
@@ -1778,11 +1959,15 @@ def main():
                 print(f"{etype}\t{size}\t{name}")
 
         elif args.cmd == "cat":
+            # Os bytes vão para o stdout conforme chegam do socket
+            def _write_stdout(chunk: bytes) -> None:
+                _write_all(1, chunk)
+
             if args.wait:
                 timeout_s = float(args.timeout)
                 retry_sleep = float(args.retry_sleep)
                 while True:
-                    resp, data = await rpc_call(
+                    resp = await rpc_call_stream(
                         args.socket,
                         {
                             "cmd": "read",
@@ -1793,10 +1978,9 @@ def main():
                             "mode": args.mode,
                             "timeout_s": timeout_s,
                         },
-                        want_bytes=True,
+                        _write_stdout,
                     )
                     if resp.get("ok"):
-                        os.write(1, data)
                         return
                     err = resp.get("error", "")
                     if "Timeout" in err:
@@ -1808,7 +1992,7 @@ def main():
                         _print_error(resp.get("error", "falha ao ler arquivo"))
                     return
             else:
-                resp, data = await rpc_call(
+                resp = await rpc_call_stream(
                     args.socket,
                     {
                         "cmd": "read",
@@ -1818,7 +2002,7 @@ def main():
                         "size": args.size,
                         "mode": args.mode,
                     },
-                    want_bytes=True,
+                    _write_stdout,
                 )
                 if not resp.get("ok"):
                     if args.json:
@@ -1826,7 +2010,6 @@ def main():
                     else:
                         _print_error(resp.get("error", "falha ao ler arquivo"))
                     return
-                os.write(1, data)
 
         elif args.cmd == "pin":
             resp, _ = await rpc_call(
@@ -1910,7 +2093,9 @@ def main():
                     {"cmd": "unpin", "torrent": torrent, "path": path},
                 )
 
-            unpinned, errors = await _walk_and_apply(args.path, max_files, max_depth, _unpin)
+            unpinned, errors = await _walk_and_apply(
+                args.path, max_files, max_depth, _unpin, int(args.concurrency)
+            )
             out = {"ok": len(errors) == 0, "unpinned": unpinned, "errors": errors}
             if args.json:
                 _print_json(out)
@@ -1947,7 +2132,9 @@ def main():
                     {"cmd": "prefetch", "torrent": torrent, "path": path},
                 )
 
-            prefetched, errors = await _walk_and_apply(args.path, max_files, max_depth, _prefetch)
+            prefetched, errors = await _walk_and_apply(
+                args.path, max_files, max_depth, _prefetch, int(args.concurrency)
+            )
             out = {"ok": len(errors) == 0, "prefetched": prefetched, "errors": errors}
             if args.json:
                 _print_json(out)
@@ -1957,31 +2144,27 @@ def main():
                     _print_error(f"{err.get('path')}: {err.get('error')}")
 
         elif args.cmd == "uploads":
-            resp, _ = await rpc_call(
-                args.socket,
-                {"cmd": "peers", "torrent": torrent},
-            )
             if args.json:
+                resp, _ = await rpc_call(
+                    args.socket,
+                    {"cmd": "peers", "torrent": torrent},
+                )
                 _print_json(resp)
                 return
+            (resp, _), label_map = await asyncio.gather(
+                rpc_call(
+                    args.socket,
+                    {"cmd": "peers", "torrent": torrent},
+                ),
+                _get_label_map(),
+            )
             if not resp.get("ok"):
                 _print_error(resp.get("error", "falha ao obter peers"))
                 return
             peers = resp.get("peers", [])
-            label_map = {}
-            resp_names, _ = await rpc_call(args.socket, {"cmd": "torrents"})
-            if resp_names.get("ok"):
-                label_map = _torrent_label_map(resp_names.get("torrents", []))
             label = label_map.get(torrent, args.torrent or torrent)
             _print_peers_summary(torrent, label, peers)
-            peers_sorted = sorted(
-                peers,
-                key=lambda p: int(p.get("upload_rate", 0)) + int(p.get("download_rate", 0)),
-                reverse=True,
-            )
-            for p in peers_sorted:
-                up = int(p.get("upload_rate", 0))
-                down = int(p.get("download_rate", 0))
+            for _, up, down, p in _rank_peers(peers):
                 if not args.all and up <= 0 and down <= 0:
                     continue
                 _print_peer_line(p)
@@ -2019,6 +2202,24 @@ def main():
                 else:
                     _print_error("chunk-size invalido")
                 return
+            concurrency = max(1, int(args.concurrency))
+            pipeline_depth = max(1, int(args.pipeline_depth))
+            batch_size = max(1, int(args.batch_size))
+            # Blocos adaptativos: dobram enquanto a vazão por bloco cresce e caem
+            # pela metade em Timeout ou queda brusca, entre chunk_size e o limite
+            # do daemon para um read.
+            # Bytes em voo por arquivo: o mesmo que pipeline_depth blocos de
+            # chunk_size. Blocos maiores reduzem a profundidade em vez de
+            # multiplicar a memória (até --concurrency arquivos de uma vez), e
+            # nunca passam do orçamento inteiro.
+            inflight_budget = pipeline_depth * chunk_size
+            max_chunk = (
+                chunk_size
+                if args.fixed_chunk
+                else max(chunk_size, min(4 * 1024 * 1024, inflight_budget))
+            )
+            cur_chunk = chunk_size
+            rate_ema = None
             show_progress = bool(args.progress)
             read_timeout = float(args.read_timeout)
             if read_timeout <= 0:
@@ -2035,11 +2236,44 @@ def main():
                     return f"{h:02d}:{m:02d}:{s:02d}"
                 return f"{m:02d}:{s:02d}"
 
+            # O primeiro bloco é pedido junto com o stat: se a origem for um arquivo,
+            # a cópia já começa com ele em voo; se for diretório, a resposta
+            # (IsADirectory) é descartada. Uma origem terminada em "/" (ou a raiz)
+            # é diretório com certeza: nem pede.
+            first_read = None
+            if args.src.rstrip("/") and not args.src.endswith("/"):
+                first_read = (
+                    asyncio.create_task(
+                        rpc_call(
+                            args.socket,
+                            {
+                                "cmd": "read",
+                                "torrent": torrent,
+                                "path": args.src,
+                                "offset": 0,
+                                "size": chunk_size,
+                                "timeout_s": read_timeout,
+                            },
+                            want_bytes=True,
+                        )
+                    ),
+                    time.monotonic(),
+                )
+
+            def _discard_first_read() -> None:
+                if first_read is None:
+                    return
+                task = first_read[0]
+                task.cancel()
+                # Já concluído, o resultado (ou exceção) é só consumido
+                task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
             resp, _ = await rpc_call(
                 args.socket,
                 {"cmd": "stat", "torrent": torrent, "path": args.src},
             )
             if not resp.get("ok"):
+                _discard_first_read()
                 if args.json:
                     _print_json(resp)
                 else:
@@ -2048,81 +2282,292 @@ def main():
 
             src_stat = resp.get("stat", {})
             src_is_dir = src_stat.get("type") == "dir"
+            if src_is_dir:
+                _discard_first_read()
             dest = args.dest
             copied_bytes = 0
             copied_blocks = 0
             total_bytes = 0
             total_blocks = 0
             start_ts = time.monotonic()
-            last_report = start_ts
+            next_report_ts = start_ts + 0.5
+            # Escreve o progresso direto no buffer binário do stderr (sem a camada de texto)
+            err_buffer = getattr(sys.stderr, "buffer", None)
+            if err_buffer is not None:
+                sys.stderr.flush()
 
             def _maybe_report(done: bool = False) -> None:
-                nonlocal last_report
+                # Chamado uma vez por bloco ou retry: o relógio custa nada perto
+                # do RPC, e só ele garante um relatório a cada 0,5 s.
+                nonlocal next_report_ts
                 if not show_progress:
                     return
                 now = time.monotonic()
-                if not done and (now - last_report) < 0.5:
+                if not done and now < next_report_ts:
                     return
-                last_report = now
+                next_report_ts = now + 0.5
                 rate = copied_bytes / max(now - start_ts, 1e-6)
                 remaining = max(total_bytes - copied_bytes, 0)
                 eta = remaining / rate if rate > 0 else float("inf")
                 pct = (copied_bytes / total_bytes * 100.0) if total_bytes > 0 else 0.0
                 msg = (
-                    f"copiado {copied_bytes}/{total_bytes} bytes ({pct:.2f}%) "
+                    f"\rcopiado {copied_bytes}/{total_bytes} bytes ({pct:.2f}%) "
                     f"blocos {copied_blocks}/{total_blocks} eta { _format_eta(eta) }"
                 )
                 if done:
-                    sys.stderr.write("\r" + msg + "\n")
-                else:
-                    sys.stderr.write("\r" + msg)
-                sys.stderr.flush()
+                    msg += "\n"
+                if err_buffer is None:
+                    sys.stderr.write(msg)
+                    sys.stderr.flush()
+                    return
+                # Sem quebra de linha o buffer não esvazia sozinho: flush a cada relatório.
+                err_buffer.write(msg.encode("ascii"))
+                err_buffer.flush()
 
+            def _adapt_chunk(nbytes: int, elapsed: float, timed_out: bool = False) -> None:
+                nonlocal cur_chunk, rate_ema
+                if max_chunk == chunk_size:
+                    return
+                if timed_out:
+                    cur_chunk = max(chunk_size, cur_chunk // 2)
+                    return
+                sample = nbytes / max(elapsed, 1e-6)
+                if rate_ema is not None:
+                    if sample > rate_ema * 1.1:
+                        cur_chunk = min(max_chunk, cur_chunk * 2)
+                    elif sample < rate_ema * 0.7:
+                        cur_chunk = max(chunk_size, cur_chunk // 2)
+                    sample = 0.8 * rate_ema + 0.2 * sample
+                rate_ema = sample
+
+            def _read_block(base: dict, offset: int, to_read: int):
+                # `base` traz os campos fixos do arquivo; só offset/size mudam por bloco
+                return asyncio.create_task(
+                    rpc_call(
+                        args.socket,
+                        {**base, "offset": offset, "size": to_read},
+                        want_bytes=True,
+                    )
+                )
+
+            async def _copy_file(src_path: str, size: int, target: str, first=None) -> bool:
+                """
+                Copia um arquivo com até `pipeline_depth` reads e `inflight_budget`
+                bytes em voo (pelo menos um read sempre sai). O destino é
+                pré-alocado e cada bloco é gravado com pwrite no seu offset assim que
+                chega, sem esperar os anteriores; um Timeout reagenda só aquele bloco.
+                O tamanho de cada novo bloco vem de `cur_chunk` (ver _adapt_chunk).
+                `first` é um (task, instante) já disparado para o offset 0, de chunk_size bytes.
+                Se a cópia falha, o destino é truncado no trecho contínuo já gravado desde
+                o início, como na cópia sequencial: sem os buracos da pré-alocação, um
+                arquivo incompleto não fica com o tamanho de um completo.
+                """
+                nonlocal copied_bytes, copied_blocks
+                base = {"cmd": "read", "torrent": torrent, "path": src_path, "timeout_s": read_timeout}
+                pending = {}
+                next_offset = 0
+                end = size
+                inflight = 0
+                # Fim do trecho contínuo gravado desde o offset 0; blocos que
+                # chegam fora de ordem esperam em `written` (offset -> fim).
+                prefix = 0
+                written = {}
+                complete = False
+                if first is not None:
+                    if size > 0:
+                        next_offset = min(chunk_size, size)
+                        pending[first[0]] = (0, next_offset, first[1])
+                        inflight = next_offset
+                    else:
+                        first[0].cancel()
+                fd = os.open(target, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+                try:
+                    if size > 0 and hasattr(os, "posix_fallocate"):
+                        try:
+                            os.posix_fallocate(fd, 0, size)
+                        except OSError:
+                            pass
+                    while pending or next_offset < end:
+                        while next_offset < end and len(pending) < pipeline_depth:
+                            to_read = min(cur_chunk, end - next_offset)
+                            if pending and inflight + to_read > inflight_budget:
+                                break
+                            pending[_read_block(base, next_offset, to_read)] = (
+                                next_offset,
+                                to_read,
+                                time.monotonic(),
+                            )
+                            inflight += to_read
+                            next_offset += to_read
+                        done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                        for task in done:
+                            offset, to_read, issued = pending.pop(task)
+                            inflight -= to_read
+                            resp, data = task.result()
+                            if not resp.get("ok"):
+                                err = resp.get("error", "")
+                                if "Timeout" in err:
+                                    _adapt_chunk(0, 0.0, timed_out=True)
+                                    _maybe_report()
+                                    await asyncio.sleep(0.2)
+                                    pending[_read_block(base, offset, to_read)] = (
+                                        offset,
+                                        to_read,
+                                        time.monotonic(),
+                                    )
+                                    inflight += to_read
+                                    continue
+                                errors.append({"path": src_path, "error": err})
+                                return False
+                            if not data:
+                                # Fim do arquivo antes do tamanho informado pelo stat
+                                end = min(end, offset)
+                                continue
+                            os.pwrite(fd, data, offset)
+                            written[offset] = offset + len(data)
+                            while prefix in written:
+                                prefix = written.pop(prefix)
+                            copied_bytes += len(data)
+                            # Blocos contados em unidades de chunk_size, como no total
+                            copied_blocks += -(-len(data) // chunk_size)
+                            _adapt_chunk(len(data), time.monotonic() - issued)
+                            _maybe_report()
+                            if len(data) < to_read:
+                                # Leitura curta: pede só o restante do bloco.
+                                rest = offset + len(data)
+                                pending[_read_block(base, rest, to_read - len(data))] = (
+                                    rest,
+                                    to_read - len(data),
+                                    time.monotonic(),
+                                )
+                                inflight += to_read - len(data)
+                    if end < size:
+                        os.ftruncate(fd, end)
+                    complete = True
+                finally:
+                    for t in pending:
+                        t.cancel()
+                    if not complete:
+                        try:
+                            os.ftruncate(fd, prefix)
+                        except OSError:
+                            pass
+                    os.close(fd)
+                return True
+
+            errors = []
             if src_is_dir:
                 os.makedirs(dest, exist_ok=True)
                 files, errors = await _walk_files(args.src, max_files, max_depth)
-                total_bytes = sum(f.get("size", 0) for f in files)
-                total_blocks = sum(
-                    math.ceil(int(f.get("size", 0)) / chunk_size) for f in files if int(f.get("size", 0)) > 0
-                )
+                # Uma passada só, com divisão inteira arredondada para cima
+                for f in files:
+                    fsize = f["size"]
+                    total_bytes += fsize
+                    total_blocks += (fsize + chunk_size - 1) // chunk_size
                 copied = 0
+                sem = asyncio.Semaphore(concurrency)
+                batch_supported = batch_size > 1
+
+                # Destinos calculados uma vez por arquivo; cada diretório de destino é
+                # criado uma única vez, de cima para baixo, antes das cópias.
+                # Prefixo da origem e raiz do destino resolvidos fora do laço:
+                # por arquivo, só um fatiamento e uma concatenação.
+                src_root = args.src.rstrip("/")
+                prefix_len = len(src_root) + 1 if src_root else 0
+                dest_root = dest.rstrip("/")
+                targets = {}
+                seen_dirs = set()
                 for item in files:
-                    rel = item["path"][len(args.src) :].lstrip("/")
-                    target = os.path.join(dest, rel)
-                    os.makedirs(os.path.dirname(target), exist_ok=True)
-                    offset = 0
-                    size = int(item.get("size", 0))
-                    with open(target, "wb") as f:
-                        while offset < size:
-                            to_read = min(chunk_size, size - offset)
+                    path = item["path"]
+                    rel = path[prefix_len:]
+                    targets[path] = f"{dest_root}/{rel}"
+                    head, sep, _ = rel.rpartition("/")
+                    seen_dirs.add(f"{dest_root}/{head}" if sep else dest)
+                for d in sorted(seen_dirs):
+                    os.makedirs(d, exist_ok=True)
+
+                def _target_for(item: dict) -> str:
+                    return targets[item["path"]]
+
+                async def _copy_one(item: dict) -> None:
+                    nonlocal copied
+                    async with sem:
+                        await _copy_file(item["path"], int(item.get("size", 0)), _target_for(item))
+                        copied += 1
+
+                async def _copy_batch(items: list) -> None:
+                    """
+                    Copia arquivos de um bloco só com um único read-batch.
+                    Timeouts e leituras curtas caem no caminho normal de _copy_file.
+                    """
+                    nonlocal copied, copied_bytes, copied_blocks, batch_supported
+                    async with sem:
+                        resp = None
+                        if batch_supported:
                             resp, data = await rpc_call(
                                 args.socket,
                                 {
-                                    "cmd": "read",
+                                    "cmd": "read-batch",
                                     "torrent": torrent,
-                                    "path": item["path"],
-                                    "offset": offset,
-                                    "size": to_read,
+                                    "reads": [
+                                        {"path": it["path"], "offset": 0, "size": int(it.get("size", 0))}
+                                        for it in items
+                                    ],
                                     "timeout_s": read_timeout,
                                 },
                                 want_bytes=True,
                             )
                             if not resp.get("ok"):
                                 err = resp.get("error", "")
+                                if err.startswith("UnknownCommand"):
+                                    # Daemon antigo: desliga o lote para o resto da cópia.
+                                    batch_supported = False
+                                else:
+                                    errors.extend({"path": it["path"], "error": err} for it in items)
+                                    return
+                                resp = None
+                        if resp is None:
+                            for it in items:
+                                await _copy_file(it["path"], int(it.get("size", 0)), _target_for(it))
+                                copied += 1
+                            return
+                        view = memoryview(data)
+                        pos = 0
+                        for it, res in zip(items, resp.get("results") or []):
+                            size = int(it.get("size", 0))
+                            target = _target_for(it)
+                            if not res.get("ok"):
+                                err = res.get("error", "")
                                 if "Timeout" in err:
-                                    _maybe_report()
-                                    await asyncio.sleep(0.2)
-                                    continue
-                                errors.append({"path": item["path"], "error": err})
-                                break
-                            if not data:
-                                break
-                            f.write(data)
-                            offset += len(data)
-                            copied_bytes += len(data)
+                                    await _copy_file(it["path"], size, target)
+                                    copied += 1
+                                else:
+                                    errors.append({"path": it["path"], "error": err})
+                                continue
+                            n = int(res.get("data_len", 0))
+                            chunk = view[pos : pos + n]
+                            pos += n
+                            if n < size:
+                                await _copy_file(it["path"], size, target)
+                                copied += 1
+                                continue
+                            with open(target, "wb") as f:
+                                f.write(chunk)
+                            copied_bytes += n
                             copied_blocks += 1
+                            copied += 1
                             _maybe_report()
-                    copied += 1
+
+                small = []
+                jobs = []
+                for item in files:
+                    if batch_supported and 0 < int(item.get("size", 0)) <= chunk_size:
+                        small.append(item)
+                    else:
+                        jobs.append(_copy_one(item))
+                for i in range(0, len(small), batch_size):
+                    jobs.append(_copy_batch(small[i : i + batch_size]))
+                await asyncio.gather(*jobs)
                 _maybe_report(done=True)
                 out = {
                     "ok": len(errors) == 0,
@@ -2148,39 +2593,8 @@ def main():
             os.makedirs(os.path.dirname(dest) or ".", exist_ok=True)
             size = int(src_stat.get("size", 0))
             total_bytes = size
-            total_blocks = math.ceil(size / chunk_size) if size > 0 else 0
-            offset = 0
-            errors = []
-            with open(dest, "wb") as f:
-                while offset < size:
-                    to_read = min(chunk_size, size - offset)
-                    resp, data = await rpc_call(
-                        args.socket,
-                        {
-                            "cmd": "read",
-                            "torrent": torrent,
-                            "path": args.src,
-                            "offset": offset,
-                            "size": to_read,
-                            "timeout_s": read_timeout,
-                        },
-                        want_bytes=True,
-                    )
-                    if not resp.get("ok"):
-                        err = resp.get("error", "")
-                        if "Timeout" in err:
-                            _maybe_report()
-                            await asyncio.sleep(0.2)
-                            continue
-                        errors.append({"path": args.src, "error": err})
-                        break
-                    if not data:
-                        break
-                    f.write(data)
-                    offset += len(data)
-                    copied_bytes += len(data)
-                    copied_blocks += 1
-                    _maybe_report()
+            total_blocks = (size + chunk_size - 1) // chunk_size
+            await _copy_file(args.src, size, dest, first=first_read)
             _maybe_report(done=True)
             out = {
                 "ok": len(errors) == 0,
@@ -2200,7 +2614,20 @@ def main():
                 for err in errors:
                     _print_error(f"{err.get('path')}: {err.get('error')}")
 
-    asyncio.run(run())
+    async def _run_and_close() -> None:
+        try:
+            await run()
+        finally:
+            await close_pools()
+
+    if uvloop is None:
+        asyncio.run(_run_and_close())
+    elif hasattr(uvloop, "run"):
+        uvloop.run(_run_and_close())
+    else:
+        # uvloop < 0.18 não tem run(): troca a policy global
+        uvloop.install()
+        asyncio.run(_run_and_close())
 
 
 if __name__ == "__main__":
@@ -1,28 +1,137 @@
 import asyncio, struct, json
 
+try:
+    import orjson
+except Exception:
+    orjson = None
+
+
+if orjson is not None:
+
+    def _dumps(obj) -> bytes:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            # Inteiros > 64 bits e afins: o json da stdlib aceita
+            return json.dumps(obj).encode()
+
+    def _loads(data: bytes):
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # NaN/Infinity vindos de um peer que usa o json da stdlib
+            return json.loads(data.decode())
+
+else:
+
+    def _dumps(obj) -> bytes:
+        return json.dumps(obj).encode()
+
+    def _loads(data: bytes):
+        return json.loads(data.decode())
+
+
+_HDR = struct.Struct(">I")
+_pack_hdr = _HDR.pack
+_unpack_hdr = _HDR.unpack
+
 async def recv_frame(reader):
     hdr = await reader.readexactly(4)
-    (n,) = struct.unpack(">I", hdr)
+    (n,) = _unpack_hdr(hdr)
     return await reader.readexactly(n)
 
 async def send_frame(writer, payload):
-    writer.write(struct.pack(">I", len(payload)))
-    writer.write(payload)
+    writer.writelines((_pack_hdr(len(payload)), payload))
     await writer.drain()
 
 async def recv_json(reader):
-    return json.loads((await recv_frame(reader)).decode())
+    return _loads(await recv_frame(reader))
 
 async def send_json(writer, obj):
-    await send_frame(writer, json.dumps(obj).encode())
+    await send_frame(writer, _dumps(obj))
 
 async def send_bytes(writer, data):
     writer.write(data)
     await writer.drain()
-    
+
+async def send_json_with_bytes(writer, obj, chunks):
+    """
+    Envia o cabeçalho JSON e os bytes crus de uma resposta de leitura
+    em uma única escrita no transporte.
+    """
+    payload = _dumps(obj)
+    writer.writelines((_pack_hdr(len(payload)), payload, *chunks))
+    await writer.drain()
+
+async def send_json_with_file(writer, obj, f, offset: int, count: int):
+    """
+    Envia o cabeçalho JSON e `count` bytes de `f` a partir de `offset`
+    com loop.sendfile (os.sendfile quando o transporte permite), sem
+    trazer os dados para o espaço do usuário.
+    """
+    await send_json(writer, obj)
+    if count > 0:
+        await asyncio.get_running_loop().sendfile(writer.transport, f, offset, count)
+
 async def recv_bytes(reader, size: int) -> bytes:
     """
     Recebe exatamente `size` bytes do stream.
     Usado após um read() RPC que retorna data_len.
     """
     return await reader.readexactly(size)
+
+async def recv_bytes_into(reader, size: int, write, chunk_size: int = 64 * 1024) -> None:
+    """
+    Recebe exatamente `size` bytes do stream, repassando-os a `write` em
+    blocos de até `chunk_size`, sem montar a resposta inteira em memória.
+    """
+    while size > 0:
+        chunk = await reader.readexactly(min(size, chunk_size))
+        write(chunk)
+        size -= len(chunk)
+
+
+class ConnectionPool:
+    """
+    Conexões persistentes com um socket do daemon.
+
+    O servidor atende uma requisição por vez em cada conexão, então cada
+    chamada usa uma conexão com exclusividade e a devolve ao terminar.
+    Chamadas concorrentes abrem conexões extras, que depois ficam ociosas
+    para reuso (até `max_idle`).
+    """
+
+    def __init__(self, path: str, max_idle: int = 32):
+        self.path = path
+        self.max_idle = max_idle
+        self._idle = []
+
+    async def acquire(self):
+        """
+        Retorna (reader, writer, reused). `reused` indica conexão já usada,
+        que pode ter sido fechada pelo daemon (ex.: reinício).
+        """
+        while self._idle:
+            reader, writer = self._idle.pop()
+            if reader.at_eof() or writer.is_closing():
+                writer.close()
+                continue
+            return reader, writer, True
+        reader, writer = await asyncio.open_unix_connection(self.path)
+        return reader, writer, False
+
+    def release(self, reader, writer) -> None:
+        if len(self._idle) < self.max_idle and not writer.is_closing() and not reader.at_eof():
+            self._idle.append((reader, writer))
+        else:
+            writer.close()
+
+    async def close(self) -> None:
+        idle, self._idle = self._idle, []
+        for _, writer in idle:
+            writer.close()
+        for _, writer in idle:
+            try:
+                await writer.wait_closed()
+            except Exception:
+                pass
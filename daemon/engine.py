@@ -5,14 +5,24 @@ import json
 import sys
 import time
 import threading
-from dataclasses import dataclass
-from typing import Dict, List, Optional, Tuple, Any
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Any, BinaryIO
 import binascii
+import functools
+import itertools
+import operator
 import datetime
 import urllib.parse
 
 import libtorrent as lt
 
+try:
+    import orjson
+except Exception:
+    orjson = None
+
 # Limites mais altos para torrents com metadata grande.
 DEFAULT_MAX_METADATA_BYTES = 100 * 1024 * 1024
 DEFAULT_CONFIG_PATH = os.path.abspath(
@@ -36,6 +46,47 @@ def _find_config_path() -> str:
     if os.path.exists(SYSTEM_CONFIG_PATH):
         return SYSTEM_CONFIG_PATH
     return DEFAULT_CONFIG_PATH
+# Acima disso, _missing_pieces consulta o bitfield inteiro em vez de have_piece por piece
+_BITFIELD_MIN_PIECES = 8
+
+# Espera máxima por volta em _wait_pieces. Com piece_finished_alert os reads
+# são acordados pela thread de alertas e o limite é só uma rede de segurança;
+# sem ele (builds que não expõem o alerta), a espera volta a ser polling.
+_PIECE_WAIT_ALERT_S = 1.0
+_PIECE_WAIT_POLL_S = 0.02
+
+# Tipos de alerta tratados por _alert_loop
+_ALERT_PIECE_FINISHED = 1
+_ALERT_FILE_COMPLETED = 2
+_ALERT_RESUME_OK = 3
+_ALERT_RESUME_FAILED = 4
+
+# Readahead de streaming: janela de pieces à frente do read, com prioridade
+# decrescente pela distância (limite da faixa, prioridade).
+READAHEAD_PIECES = 32
+READAHEAD_DEADLINE_MS = 100
+_READAHEAD_TIERS = ((4, 7), (16, 5), (None, 3))
+
+# status() é consultado em polling por CLI/daemon; o libtorrent só atualiza
+# os contadores a cada tick, então uma leitura recente é reaproveitada.
+STATUS_CACHE_TTL_S = 0.2
+# Idem para file_progress(), que devolve um inteiro por arquivo do torrent.
+FILE_PROGRESS_CACHE_TTL_S = 0.5
+# Idade máxima do bitfield de pieces aceita por consultas informativas
+# (file_info); reads sempre buscam um bitfield novo.
+PIECES_CACHE_TTL_S = 0.25
+# Lista de trackers do handle (um announce_entry por tracker, serializado a
+# cada trackers()). Alterações feitas pelo próprio engine descartam a cópia.
+TRACKERS_CACHE_TTL_S = 0.5
+
+# fds de arquivos do cache mantidos abertos por torrent (LRU). Torrents com
+# milhares de arquivos não podem segurar um fd por arquivo já lido.
+FD_CACHE_MAX = 16
+
+_FADV_NORMAL = getattr(os, "POSIX_FADV_NORMAL", None) if hasattr(os, "posix_fadvise") else None
+_FADV_SEQUENTIAL = getattr(os, "POSIX_FADV_SEQUENTIAL", None) if hasattr(os, "posix_fadvise") else None
+_FADV_DONTNEED = getattr(os, "POSIX_FADV_DONTNEED", None) if hasattr(os, "posix_fadvise") else None
+
 PREFETCH_MEDIA_START_PCT = 0.10
 PREFETCH_MEDIA_END_PCT = 0.02
 PREFETCH_MEDIA_START_MIN = 4 * 1024 * 1024
@@ -74,6 +125,10 @@ def _parse_pct(value, default: float) -> float:
 
 
 def _get_cfg(cfg: dict, path: str, default):
+    # Config vinda de _load_config_with_meta traz o índice achatado
+    flat = cfg.get("_flat") if isinstance(cfg, dict) else None
+    if flat is not None:
+        return flat.get(path, default)
     cur = cfg
     for key in path.split("."):
         if not isinstance(cur, dict) or key not in cur:
@@ -191,7 +246,23 @@ def _load_media_exts(cfg: dict) -> List[str]:
 
 
 def get_effective_config() -> dict:
-    cfg = _load_config_with_meta()
+    """
+    Config efetiva (defaults aplicados). Memoizada pela identidade do arquivo
+    (path, mtime, size): o dict retornado é compartilhado e não deve ser
+    modificado.
+    """
+    path = _find_config_path()
+    try:
+        st = os.stat(path)
+        return _effective_config(path, st.st_mtime_ns, st.st_size)
+    except OSError:
+        return _effective_config(path, None, None)
+
+
+@functools.lru_cache(maxsize=4)
+def _effective_config(path: str, mtime_ns: Optional[int], size: Optional[int]) -> dict:
+    data, flat = _read_config(path)
+    cfg = {**data, "_config_path": path, "_flat": flat}
     return {
         "config_path": cfg.get("_config_path"),
         "max_metadata_bytes": _resolve_max_metadata(cfg),
@@ -214,31 +285,25 @@ def get_effective_config() -> dict:
         "skip_check": bool(_get_cfg(cfg, "skip_check", False)),
         "resume_save_interval_s": int(_get_cfg(cfg, "resume.save_interval_s", 300) or 0),
         "checking_max_active": int(_get_cfg(cfg, "checking.max_active", 0) or 0),
+        "readahead_pieces": int(_get_cfg(cfg, "readahead.pieces", READAHEAD_PIECES) or 0),
+        "readahead_deadline_ms": int(
+            _get_cfg(cfg, "readahead.deadline_ms", READAHEAD_DEADLINE_MS) or 0
+        ),
+        "readahead_drop_behind": bool(_get_cfg(cfg, "readahead.drop_behind", False)),
     }
 
 
-_SKIP_CHECK_WARNED = False
-
-
-def _build_add_torrent_params(info: lt.torrent_info, cache_dir: str, skip_check: bool) -> dict:
-    global _SKIP_CHECK_WARNED
-    params = {
-        "ti": info,
-        "save_path": cache_dir,
-        "storage_mode": lt.storage_mode_t.storage_mode_sparse,
-    }
-    if not skip_check:
-        return params
-
+def _probe_skip_check_flags():
+    """
+    Flags de add_torrent para pular a verificação de hash (default_flags +
+    flag de no-verify), ou None se esta versão do libtorrent não suporta.
+    """
     try:
         tflags = getattr(lt, "torrent_flags_t", None)
     except Exception:
         tflags = None
     if tflags is None:
-        if not _SKIP_CHECK_WARNED:
-            print("[torrentfs] skip_check nao suportado nesta versao do libtorrent", file=sys.stderr)
-            _SKIP_CHECK_WARNED = True
-        return params
+        return None
 
     flag = None
     for name in ("flag_no_verify_files", "flag_disable_hash_checks", "flag_skip_hash_checking"):
@@ -246,10 +311,7 @@ def _build_add_torrent_params(info: lt.torrent_info, cache_dir: str, skip_check:
         if flag is not None:
             break
     if flag is None:
-        if not _SKIP_CHECK_WARNED:
-            print("[torrentfs] skip_check nao suportado nesta versao do libtorrent", file=sys.stderr)
-            _SKIP_CHECK_WARNED = True
-        return params
+        return None
 
     try:
         base_flags = tflags.default_flags
@@ -257,29 +319,122 @@ def _build_add_torrent_params(info: lt.torrent_info, cache_dir: str, skip_check:
         try:
             base_flags = tflags(0)
         except Exception:
-            return params
+            return None
+    return base_flags | flag
+
+
+# Os recursos do libtorrent não mudam durante a execução: resolvidos uma vez
+_SKIP_CHECK_FLAGS = _probe_skip_check_flags()
+_SKIP_CHECK_WARNED = False
+
+
+def _build_add_torrent_params(info: lt.torrent_info, cache_dir: str, skip_check: bool) -> dict:
+    global _SKIP_CHECK_WARNED
+    params = {
+        "ti": info,
+        "save_path": cache_dir,
+        "storage_mode": lt.storage_mode_t.storage_mode_sparse,
+    }
+    if not skip_check:
+        return params
+
+    if _SKIP_CHECK_FLAGS is None:
+        if not _SKIP_CHECK_WARNED:
+            print("[torrentfs] skip_check nao suportado nesta versao do libtorrent", file=sys.stderr)
+            _SKIP_CHECK_WARNED = True
+        return params
 
-    params["flags"] = base_flags | flag
+    params["flags"] = _SKIP_CHECK_FLAGS
     return params
 
 
-def _load_config() -> dict:
-    path = _find_config_path()
+def _alert_mask() -> Optional[int]:
+    """
+    Categorias de alerta usadas pelo engine: erros/status/storage (resume data),
+    piece_progress (piece_finished_alert, que acorda os reads em espera) e
+    file_progress (file_completed_alert, contagem de arquivos completos).
+    """
+    cat = getattr(getattr(lt, "alert", None), "category_t", None)
+    if cat is None:
+        return None
+    mask = 0
+    for name in (
+        "error_notification",
+        "status_notification",
+        "storage_notification",
+        "piece_progress_notification",
+        "file_progress_notification",
+    ):
+        mask |= int(getattr(cat, name, 0))
+    return mask or None
+
+
+def _json_loads(data: bytes):
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # NaN/Infinity e afins: o json da stdlib aceita
+            pass
+    return json.loads(data)
+
+
+# Config já parseada, por path absoluto: (st_mtime_ns, st_size, dados, dados achatados).
+# Os dados são compartilhados entre chamadas e devem ser tratados como somente
+# leitura.
+_CFG_CACHE: Dict[str, Tuple[int, int, Any, dict]] = {}
+
+
+def _flatten_cfg(cfg, prefix: str = "", out: Optional[dict] = None) -> dict:
+    """
+    {"a": {"b": 1}} -> {"a": {"b": 1}, "a.b": 1}: toda chave que _get_cfg
+    alcançaria descendo a árvore vira uma consulta direta.
+    """
+    if out is None:
+        out = {}
+    if isinstance(cfg, dict):
+        for key, value in cfg.items():
+            if not isinstance(key, str) or "." in key:
+                # inalcançável por um caminho pontilhado
+                continue
+            path = f"{prefix}.{key}" if prefix else key
+            out[path] = value
+            _flatten_cfg(value, path, out)
+    return out
+
+
+def _read_config(path: str) -> Tuple[Any, dict]:
+    # Chave absoluta: um TORRENTFSD_CONFIG relativo não pode reaproveitar o
+    # cache de outro arquivo depois de uma troca de diretório corrente.
+    key = os.path.abspath(path)
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
+        st = os.stat(key)
+        cached = _CFG_CACHE.get(key)
+        if cached is not None and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+            return cached[2], cached[3]
+        with open(key, "rb") as f:
+            data = _json_loads(f.read())
     except FileNotFoundError:
-        return {}
+        return {}, {}
     except Exception as e:
         print(f"[torrentfs] config invalida: {e}", file=sys.stderr)
-        return {}
+        return {}, {}
+    flat = _flatten_cfg(data)
+    _CFG_CACHE[key] = (st.st_mtime_ns, st.st_size, data, flat)
+    return data, flat
+
+
+def _load_config(path: Optional[str] = None) -> dict:
+    if path is None:
+        path = _find_config_path()
+    return _read_config(path)[0]
 
 
 def _load_config_with_meta() -> dict:
     path = _find_config_path()
-    data = _load_config()
-    data["_config_path"] = path
-    return data
+    data, flat = _read_config(path)
+    # Cópia rasa: o dict em cache não recebe _config_path
+    return {**data, "_config_path": path, "_flat": flat}
 
 # Tenta usar o PathIndex do projeto.
 # Se ainda não existir, usa um fallback simples.
@@ -292,67 +447,110 @@ except Exception:
 # -----------------------------
 # Fallback simples de índice (se você ainda não criou index.py)
 # -----------------------------
-@dataclass
-class _Node:
-    name: str
-    is_dir: bool = True
-    children: Dict[str, "_Node"] = None
-    file_index: Optional[int] = None
-    size: int = 0
-
-    def __post_init__(self):
-        if self.children is None:
-            self.children = {}
-
-
 class _FallbackPathIndex:
+    """
+    Índice plano por path normalizado ("a/b/c"): stat de cada node e, por
+    diretório, os filhos (nome -> path). O índice só cresce no __init__ do
+    engine, então list_dir é memoizado por diretório; os resultados são
+    compartilhados e não devem ser modificados.
+    """
+
     def __init__(self) -> None:
-        self.root = _Node("", True)
+        self._stat: Dict[str, dict] = {"": {"type": "dir", "size": 0}}
+        self._children: Dict[str, Dict[str, str]] = {"": {}}
+        self._listing: Dict[str, List[dict]] = {}
 
     def add_file(self, path: str, file_index: int, size: int) -> None:
         parts = [p for p in path.split("/") if p]
-        cur = self.root
-        for p in parts[:-1]:
-            cur = cur.children.setdefault(p, _Node(p, True))
-        leaf = cur.children.get(parts[-1])
-        if leaf is None:
-            leaf = _Node(parts[-1], False)
-            cur.children[parts[-1]] = leaf
-        leaf.is_dir = False
-        leaf.file_index = file_index
-        leaf.size = size
-
-    def _walk(self, path: str) -> _Node:
-        if path in ("", "/"):
-            return self.root
-        parts = [p for p in path.strip("/").split("/") if p]
-        cur = self.root
-        for p in parts:
-            if p not in cur.children:
-                raise FileNotFoundError(path)
-            cur = cur.children[p]
-        return cur
+        if not parts:
+            raise ValueError("path vazio não é permitido")
+        parent = ""
+        for name in parts[:-1]:
+            key = f"{parent}/{name}" if parent else name
+            children = self._children.setdefault(parent, {})
+            if name not in children:
+                children[name] = key
+                self._stat.setdefault(key, {"type": "dir", "size": 0})
+            parent = key
+        key = "/".join(parts)
+        self._children.setdefault(parent, {})[parts[-1]] = key
+        self._stat[key] = {"type": "file", "size": int(size), "file_index": int(file_index)}
+        self._listing.clear()
+
+    def build(self, entries: Iterable[Tuple[str, int, int]]) -> None:
+        """
+        Registra vários arquivos (path, file_index, size) de uma vez. Cada
+        path é quebrado uma vez só; em ordem, arquivos vizinhos compartilham
+        a cadeia de diretórios, e só o trecho que diverge do anterior é
+        criado.
+        """
+        # Tuplas, não listas: com dezenas de milhares de entradas vivas, o
+        # coletor de ciclos deixa de varrê-las a cada geração.
+        items = []
+        for path, file_index, size in entries:
+            parts = path.split("/")
+            if "" in parts:
+                parts = [p for p in parts if p]
+                if not parts:
+                    raise ValueError("path vazio não é permitido")
+            items.append((tuple(parts), int(file_index), int(size)))
+        items.sort(key=operator.itemgetter(0))
+
+        children_of = self._children
+        stat_of = self._stat
+        # chain[d] = chave do diretório na profundidade d do último arquivo
+        chain = [""]
+        prev: Tuple[str, ...] = ()
+        for parts, file_index, size in items:
+            dirs = parts[:-1]
+            if dirs != prev:
+                depth = 0
+                limit = min(len(dirs), len(prev))
+                while depth < limit and dirs[depth] == prev[depth]:
+                    depth += 1
+                del chain[depth + 1 :]
+                for name in dirs[depth:]:
+                    parent = chain[-1]
+                    key = f"{parent}/{name}" if parent else name
+                    children_of[parent].setdefault(name, key)
+                    stat_of.setdefault(key, {"type": "dir", "size": 0})
+                    children_of.setdefault(key, {})
+                    chain.append(key)
+                prev = dirs
+            parent = chain[-1]
+            name = parts[-1]
+            key = f"{parent}/{name}" if parent else name
+            children_of[parent][name] = key
+            stat_of[key] = {"type": "file", "size": size, "file_index": file_index}
+        self._listing.clear()
+
+    def freeze(self) -> None:
+        # list_dir já é memoizado; existe pelo contrato comum com PathIndex.
+        pass
+
+    def _walk(self, path: str) -> str:
+        key = path.strip("/")
+        if key not in self._stat and "//" in key:
+            key = "/".join(p for p in key.split("/") if p)
+        if key not in self._stat:
+            raise FileNotFoundError(path)
+        return key
 
     def list_dir(self, path: str) -> List[dict]:
-        node = self._walk(path)
-        if not node.is_dir:
+        key = self._walk(path)
+        if self._stat[key]["type"] != "dir":
             raise NotADirectoryError(path)
-        out = []
-        for name, ch in sorted(node.children.items(), key=lambda kv: kv[0]):
-            out.append(
-                {
-                    "name": name,
-                    "type": "dir" if ch.is_dir else "file",
-                    "size": 0 if ch.is_dir else ch.size,
-                }
-            )
+        out = self._listing.get(key)
+        if out is None:
+            out = []
+            for name, child in sorted(self._children.get(key, {}).items()):
+                st = self._stat[child]
+                out.append({"name": name, "type": st["type"], "size": st["size"]})
+            self._listing[key] = out
         return out
 
     def stat(self, path: str) -> dict:
-        node = self._walk(path)
-        if node.is_dir:
-            return {"type": "dir", "size": 0}
-        return {"type": "file", "size": node.size, "file_index": node.file_index}
+        return self._stat[self._walk(path)]
 
 
 def _get_index() -> Any:
@@ -380,6 +578,98 @@ def _load_torrent_info(path: str, max_metadata: int) -> lt.torrent_info:
     return lt.torrent_info(lt.bdecode(data))
 
 
+class _RWLock:
+    """
+    Lock de leitores/escritor: consultas rodam em paralelo entre si e só
+    esperam mutações (pin, prefetch, resume, shutdown). Escritores na fila
+    têm preferência, para um fluxo contínuo de consultas não segurá-los.
+    Não é reentrante.
+    """
+
+    def __init__(self) -> None:
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+
+    @contextmanager
+    def reading(self):
+        with self._cond:
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def writing(self):
+        with self._cond:
+            self._writers_waiting += 1
+            try:
+                while self._writer or self._readers:
+                    self._cond.wait()
+            finally:
+                self._writers_waiting -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+
+class _PieceWaiter:
+    """
+    Um read esperando pieces: a thread de alertas só sinaliza o evento se
+    alguma piece concluída estiver no conjunto que ele ainda aguarda.
+    """
+
+    __slots__ = ("pieces", "event")
+
+    def __init__(self) -> None:
+        self.pieces: frozenset = frozenset()
+        self.event = threading.Event()
+
+
+class _CacheRead:
+    """
+    Trecho de um read pronto para ser enviado direto do arquivo de cache (ver
+    TorrentEngine.open_read). O arquivo é aberto só para este envio, então o
+    fallback do sendfile (seek + read) não disputa a posição com outros reads.
+    """
+
+    __slots__ = ("file", "offset", "size", "drop_behind")
+
+    def __init__(self, file: BinaryIO, offset: int, size: int, drop_behind: bool) -> None:
+        self.file = file
+        self.offset = offset
+        self.size = size
+        # readahead.drop_behind num read de streaming: ver drop_sent()
+        self.drop_behind = drop_behind
+
+    def drop_sent(self) -> None:
+        """
+        Libera do page cache o trecho já enviado: streaming não o relê.
+        Pode iniciar writeback de páginas sujas, então não deve rodar no
+        event loop.
+        """
+        if self.size <= 0 or _FADV_DONTNEED is None:
+            return
+        try:
+            os.posix_fadvise(self.file.fileno(), self.offset, self.size, _FADV_DONTNEED)
+        except OSError:
+            pass
+
+    def close(self) -> None:
+        self.file.close()
+
+
 # -----------------------------
 # Engine
 # -----------------------------
@@ -404,21 +694,51 @@ class TorrentEngine:
         self.cache_dir = os.path.abspath(cache_dir)
         os.makedirs(self.cache_dir, exist_ok=True)
 
-        # Lock para proteger chamadas de prioridade / leitura
-        self._lock = threading.RLock()
+        # Lock de leitores/escritor para o estado mutável do engine: pins,
+        # prefetch, resume e shutdown escrevem; consultas só o seguram para
+        # copiar o estado e rodam em paralelo. O caminho de leitura não usa
+        # este lock: o índice é imutável após o __init__ e as prioridades têm
+        # um lock próprio (_prio_lock).
+        self._lock = _RWLock()
+        self._prio_lock = threading.Lock()
+        # fds abertos dos arquivos do cache (file_index -> [fd, reads em uso,
+        # advice do fadvise]),
+        # para read() fazer um único pread em vez de open/seek/read/close por
+        # chamada. LRU limitado a FD_CACHE_MAX; fds em uso não são fechados.
+        self._fd_cache: "OrderedDict[int, List[int]]" = OrderedDict()
+        self._fd_lock = threading.Lock()
+        # Depois do shutdown: novos acquires falham e fds ainda em uso são
+        # fechados pelo último _release_fd.
+        self._fds_closed = False
         self._pinned_files: set[int] = set()
         self._pinned_paths: set[str] = set()
         self._pins_path = os.path.join(self.cache_dir, ".pinned.json")
+        # Gravações em disco (pins, resume) ficam com uma thread própria, fora
+        # do _lock e da thread de alertas. Pendências do mesmo arquivo são
+        # coalescidas: só o conteúdo mais recente é gravado.
+        self._writes: Dict[str, Tuple[Any, Any]] = {}
+        self._writes_cv = threading.Condition()
+        self._writer_stop = False
+        self._writer = threading.Thread(target=self._writer_loop, daemon=True)
 
-        # Session
-        self.ses = lt.session()
         cfg = _load_config_with_meta()
         self._config_path = cfg.get("_config_path")
         max_metadata = _resolve_max_metadata(cfg)
         self._max_metadata_bytes = max_metadata
         self._prefetch_cfg = _load_prefetch_cfg(cfg)
-        self._media_exts = set(_load_media_exts(cfg))
+        # Plano de prefetch por arquivo (file_index -> (ranges, pieces, bytes)).
+        # Só depende do tamanho e do perfil do arquivo, fixos após o __init__.
+        self._prefetch_plans: Dict[int, Tuple[tuple, tuple, int]] = {}
+        self._media_exts = frozenset(_load_media_exts(cfg))
+        self._media_ext_max_len = max((len(e) for e in self._media_exts), default=0)
         self._prefetch_max_bytes = _resolve_prefetch_max_bytes(cfg)
+        self._readahead_pieces = max(
+            0, int(_get_cfg(cfg, "readahead.pieces", READAHEAD_PIECES) or 0)
+        )
+        self._readahead_deadline_ms = max(
+            0, int(_get_cfg(cfg, "readahead.deadline_ms", READAHEAD_DEADLINE_MS) or 0)
+        )
+        self._drop_behind = bool(_get_cfg(cfg, "readahead.drop_behind", False))
         self._tracker_enabled = bool(_get_cfg(cfg, "trackers.enable", True))
         if self._tracker_enabled:
             self._tracker_aliases = _resolve_tracker_aliases(cfg)
@@ -430,22 +750,39 @@ class TorrentEngine:
         self._resume_save_interval_s = int(_get_cfg(cfg, "resume.save_interval_s", 300) or 0)
         self._resume_path = os.path.join(self.cache_dir, ".resume_data")
         self._resume_stop = threading.Event()
+        # Alertas: uma thread consome a fila da sessão e despacha os eventos.
+        self._alerts_stop = threading.Event()
+        # Reads esperando pieces. set.add/discard e tuple(set) são atômicos
+        # sob o GIL, então nem quem registra nem a thread de alertas travam.
+        self._piece_waiters: set = set()
+        self._piece_wait_s = (
+            _PIECE_WAIT_ALERT_S
+            if getattr(lt, "piece_finished_alert", None) is not None
+            else _PIECE_WAIT_POLL_S
+        )
+        self._resume_done = threading.Event()
+        # Serializa os pedidos de resume (loop periódico x shutdown), que
+        # compartilham _resume_done; a espera pelo alerta fica fora do _lock.
+        self._resume_lock = threading.Lock()
+        self._status_cache: Optional[Tuple[float, dict]] = None
+        self._file_progress_cache: Optional[Tuple[float, list]] = None
+        self._pieces_cache: Optional[Tuple[float, Any]] = None
+        self._trackers_cache: Optional[Tuple[float, list]] = None
+        # Incrementado a cada alteração de trackers: uma busca concorrente
+        # com a alteração não publica a lista antiga.
+        self._trackers_gen = 0
+        # file_info de arquivos já completos, por path consultado
+        self._file_info_done: Dict[str, dict] = {}
         self._checking_max_active = int(_get_cfg(cfg, "checking.max_active", 0) or 0)
-        try:
-            settings = {
-                "max_metadata_size": max_metadata,
-                "max_torrent_file_size": max_metadata,
-            }
-            if self._checking_max_active > 0:
-                settings["max_active_checking_torrents"] = self._checking_max_active
-            self.ses.apply_settings(settings)
-        except Exception:
-            # Algumas builds nao expõem todas as chaves.
-            pass
-        self.ses.listen_on(listen_from, listen_to)
 
-        # Torrent info + handle
-        self.info = _load_torrent_info(self.torrent_path, max_metadata)
+        # Session + torrent info: o .torrent é lido e parseado numa thread
+        # enquanto a sessão sobe (metadata grande pode levar segundos).
+        with ThreadPoolExecutor(max_workers=1) as loader:
+            info_future = loader.submit(_load_torrent_info, self.torrent_path, max_metadata)
+            self.ses = self._open_session(max_metadata, listen_from, listen_to)
+            self.info = info_future.result()
+
+        # Handle
         params = _build_add_torrent_params(self.info, self.cache_dir, self._skip_check)
         resume_data = self._load_resume_data()
         if resume_data:
@@ -456,22 +793,110 @@ class TorrentEngine:
             self._force_reannounce_trackers(self._tracker_add)
 
         # Prioridades: começa com tudo 0
-        for i in range(self.info.num_files()):
-            self.handle.file_priority(i, 0)
-
-        # Índice de paths
+        num_files = self.info.num_files()
+        self._prioritize_files([0] * num_files)
+
+        # Espelho local das prioridades já enviadas ao libtorrent, para não
+        # repetir chamadas idênticas a cada read. 0xff = desconhecida.
+        self._file_prio = bytearray(num_files)
+        self._piece_prio = bytearray(b"\xff") * self.info.num_pieces()
+        self._sequential = False
+        self._batch_piece_prios = True
+        # Pieces sabidamente baixadas (1 byte por piece). Só cresce; o que
+        # ainda está em 0 é confirmado com o libtorrent.
+        self._have = bytearray(self.info.num_pieces())
+
+        # Layout dos arquivos, calculado uma vez: o caminho de leitura resolve
+        # pieces e caminhos só com aritmética e listas, sem chamar o libtorrent.
+        files = self.info.files()
+        self._piece_len = int(self.info.piece_length())
+        # Acessores do file_storage por índice, sem montar um file_entry por
+        # arquivo (o que a iteração de files() faz); map evita o frame da
+        # comprehension em torrents com dezenas de milhares de arquivos.
+        file_range = range(num_files)
+        self._file_offsets = list(map(files.file_offset, file_range))
+        self._file_sizes = list(map(files.file_size, file_range))
+        self._rel_paths = list(map(files.file_path, file_range))
+        # Pieces de cada arquivo inteiro (file_info, fim da janela de readahead)
+        self._file_pieces = [
+            self._piece_range(i, 0, size) for i, size in enumerate(self._file_sizes)
+        ]
+        self._real_paths = [os.path.join(self.cache_dir, rel) for rel in self._rel_paths]
+        self._file_is_media = bytearray(self._is_media_path(rel) for rel in self._rel_paths)
+        # Arquivos completos (1 byte por arquivo; vazios já contam). Carregado
+        # uma vez de file_progress() quando o torrent sai do checking; depois
+        # só a thread de alertas atualiza, via file_completed_alert.
+        self._file_done = bytearray(size <= 0 for size in self._file_sizes)
+        self._file_done_seeded = False
+
+        # Índice de paths (caminho relativo dentro do torrent), montado em lote
         self.index = _get_index()
-        for i, f in enumerate(self.info.files()):
-            # f.path (string com caminho relativo dentro do torrent)
-            self.index.add_file(f.path, i, f.size)
+        self.index.build(zip(self._rel_paths, range(num_files), self._file_sizes))
+        self.index.freeze()
+        # Atalho path -> file_index para os arquivos (a forma canônica do path);
+        # outras grafias e diretórios caem no índice.
+        self._path_to_fi: Dict[str, int] = {rel: i for i, rel in enumerate(self._rel_paths)}
 
         self._load_pins()
+        # Resumo da config publicado pronto: config() só lê o atributo
+        self._config_info = self._build_config_info()
+        self._writer.start()
+        threading.Thread(target=self._alert_loop, daemon=True).start()
         if self._resume_save_interval_s > 0:
             threading.Thread(target=self._resume_loop, daemon=True).start()
 
     # -----------------------------
     # Utilidades
     # -----------------------------
+    def _open_session(self, max_metadata: int, listen_from: int, listen_to: int):
+        ses = lt.session()
+        try:
+            settings = {
+                "max_metadata_size": max_metadata,
+                "max_torrent_file_size": max_metadata,
+            }
+            if self._checking_max_active > 0:
+                settings["max_active_checking_torrents"] = self._checking_max_active
+            ses.apply_settings(settings)
+        except Exception:
+            # Algumas builds nao expõem todas as chaves.
+            pass
+        mask = _alert_mask()
+        if mask is not None:
+            try:
+                ses.apply_settings({"alert_mask": mask})
+            except Exception:
+                pass
+        ses.listen_on(listen_from, listen_to)
+        return ses
+
+    def _tracker_entries(self, max_age_s: float = 0.0) -> list:
+        """
+        Trackers do handle (announce_entry), como handle.trackers().
+        Com max_age_s > 0 reaproveita a lista buscada há menos que isso, desde
+        que o engine não tenha alterado os trackers depois. A lista é
+        compartilhada e não deve ser modificada.
+        """
+        cached = self._trackers_cache
+        now = time.monotonic()
+        if max_age_s > 0 and cached is not None and now - cached[0] < max_age_s:
+            return cached[1]
+        gen = self._trackers_gen
+        entries = list(self.handle.trackers())
+        if gen == self._trackers_gen:
+            self._trackers_cache = (now, entries)
+        return entries
+
+    def _trackers_changed(self) -> None:
+        self._trackers_gen += 1
+        self._trackers_cache = None
+
+    def _replace_trackers(self, entries: list) -> None:
+        try:
+            self.handle.replace_trackers(entries)
+        finally:
+            self._trackers_changed()
+
     def _apply_tracker_aliases(self) -> None:
         if not self._tracker_enabled:
             return
@@ -481,14 +906,15 @@ class TorrentEngine:
             entries = list(self.info.trackers())
         except Exception:
             return
-        resolved = []
+        # url -> entrada, na ordem de inserção: a primeira ocorrência vence
+        resolved: Dict[str, dict] = {}
         changed = False
         extra_urls = self._expand_tracker_urls(self._tracker_add)
         extra_urls = self._prune_udp_when_http_present(extra_urls)
         if extra_urls:
             for extra in extra_urls:
-                if extra:
-                    resolved.append({"url": extra, "tier": 0})
+                if extra and extra not in resolved:
+                    resolved[extra] = {"url": extra, "tier": 0}
             changed = True
         for entry in entries:
             url = getattr(entry, "url", None)
@@ -500,41 +926,26 @@ class TorrentEngine:
             if url in self._tracker_aliases:
                 changed = True
                 for real in self._tracker_aliases.get(url, []):
-                    if not real:
-                        continue
-                    resolved.append({"url": real, "tier": int(tier or 0)})
-                continue
-            resolved.append({"url": url, "tier": int(tier or 0)})
-        seen = set()
-        deduped = []
-        for entry in resolved:
-            if not isinstance(entry, dict):
-                deduped.append(entry)
-                continue
-            url = entry.get("url", "")
-            if not url or url in seen:
+                    if real and real not in resolved:
+                        resolved[real] = {"url": real, "tier": int(tier or 0)}
                 continue
-            seen.add(url)
-            deduped.append(entry)
-        resolved = deduped
+            if url not in resolved:
+                resolved[url] = {"url": url, "tier": int(tier or 0)}
         if not changed:
             return
+        resolved_entries = list(resolved.values())
         try:
-            self.handle.replace_trackers(resolved)
+            self._replace_trackers(resolved_entries)
         except Exception:
             try:
-                for entry in resolved:
+                for entry in resolved_entries:
                     self.handle.add_tracker(entry)
             except Exception:
                 return
+            finally:
+                self._trackers_changed()
         try:
-            resolved_urls = []
-            for e in resolved:
-                if isinstance(e, dict):
-                    resolved_urls.append(e.get("url", ""))
-                else:
-                    resolved_urls.append(getattr(e, "url", ""))
-            print(f"[torrentfs] trackers resolvidos: {resolved_urls}")
+            print(f"[torrentfs] trackers resolvidos: {list(resolved)}")
         except Exception:
             pass
 
@@ -565,17 +976,15 @@ class TorrentEngine:
         for url in urls:
             if not url.startswith("http"):
                 continue
-            parsed = urllib.parse.urlparse(url)
-            if parsed.hostname and parsed.port:
-                http_hosts.add((parsed.hostname, parsed.port))
+            host_port = _tracker_host_port(url)
+            if host_port is not None:
+                http_hosts.add(host_port)
         if not http_hosts:
             return urls
         pruned: list[str] = []
         for url in urls:
-            if url.startswith("udp://"):
-                parsed = urllib.parse.urlparse(url)
-                if parsed.hostname and parsed.port and (parsed.hostname, parsed.port) in http_hosts:
-                    continue
+            if url.startswith("udp://") and _tracker_host_port(url) in http_hosts:
+                continue
             pruned.append(url)
         return pruned
 
@@ -589,7 +998,7 @@ class TorrentEngine:
                 pass
             return
         try:
-            entries = list(self.handle.trackers())
+            entries = self._tracker_entries(TRACKERS_CACHE_TTL_S)
         except Exception:
             entries = []
         fallback = False
@@ -619,16 +1028,10 @@ class TorrentEngine:
         if not targets:
             return
         try:
-            entries = list(self.handle.trackers())
+            entries = self._tracker_entries(TRACKERS_CACHE_TTL_S)
         except Exception:
             return
-        promoted = []
-        seen = set()
-        for url in targets:
-            if url in seen:
-                continue
-            promoted.append({"url": url, "tier": 0})
-            seen.add(url)
+        promoted: Dict[str, dict] = {url: {"url": url, "tier": 0} for url in targets}
         for entry in entries:
             if isinstance(entry, dict):
                 url = entry.get("url", "")
@@ -638,12 +1041,11 @@ class TorrentEngine:
                 tier = getattr(entry, "tier", 0)
             if isinstance(url, bytes):
                 url = url.decode("utf-8", "ignore")
-            if not url or url in seen:
+            if not url or url in promoted:
                 continue
-            promoted.append({"url": url, "tier": int(tier or 0)})
-            seen.add(url)
+            promoted[url] = {"url": url, "tier": int(tier or 0)}
         try:
-            self.handle.replace_trackers(promoted)
+            self._replace_trackers(list(promoted.values()))
         except Exception:
             return
 
@@ -669,7 +1071,9 @@ class TorrentEngine:
         added = []
         existing_urls = set()
         try:
-            existing_urls = {getattr(e, "url", "") for e in self.handle.trackers()}
+            existing_urls = {
+                getattr(e, "url", "") for e in self._tracker_entries(TRACKERS_CACHE_TTL_S)
+            }
         except Exception:
             existing_urls = set()
         for url in expanded:
@@ -682,36 +1086,30 @@ class TorrentEngine:
             except Exception as e:
                 msg = str(e) or type(e).__name__
                 skipped.append(f"{url} ({msg})")
+            finally:
+                self._trackers_changed()
         if added:
-            promoted = []
-            seen = set()
-            for url in added:
-                if not url or url in seen:
-                    continue
-                promoted.append({"url": url, "tier": 0})
-                seen.add(url)
+            # Só a ordem das urls importa aqui: o tier é refeito abaixo
+            # (0 para as recém-adicionadas, 1 para o resto).
+            ordered = dict.fromkeys(url for url in added if url)
             try:
-                entries = list(self.handle.trackers())
+                entries = self._tracker_entries(TRACKERS_CACHE_TTL_S)
             except Exception:
                 entries = []
             for entry in entries:
                 if isinstance(entry, dict):
                     url = entry.get("url", "")
-                    tier = entry.get("tier", 0)
                 else:
                     url = getattr(entry, "url", "")
-                    tier = getattr(entry, "tier", 0)
                 if isinstance(url, bytes):
                     url = url.decode("utf-8", "ignore")
-                if not url or url in seen:
-                    continue
-                promoted.append({"url": url, "tier": int(tier or 0)})
-                seen.add(url)
-            promoted_urls = [entry.get("url", "") for entry in promoted if isinstance(entry, dict)]
-            promoted_urls = self._prune_udp_when_http_present(promoted_urls)
-            promoted = [{"url": url, "tier": 0 if url in added else 1} for url in promoted_urls]
+                if url:
+                    ordered.setdefault(url)
+            promoted_urls = self._prune_udp_when_http_present(list(ordered))
+            added_set = set(added)
+            promoted = [{"url": url, "tier": 0 if url in added_set else 1} for url in promoted_urls]
             try:
-                self.handle.replace_trackers(promoted)
+                self._replace_trackers(promoted)
             except Exception:
                 pass
             self._promote_trackers(added)
@@ -730,7 +1128,7 @@ class TorrentEngine:
         handle_urls: List[str] = []
         torrent_urls: List[str] = []
         try:
-            entries = self.handle.trackers()
+            entries = self._tracker_entries(TRACKERS_CACHE_TTL_S)
             for e in entries:
                 if isinstance(e, dict):
                     url = e.get("url", "")
@@ -763,7 +1161,7 @@ class TorrentEngine:
 
         out = []
         try:
-            entries = list(self.handle.trackers())
+            entries = self._tracker_entries(TRACKERS_CACHE_TTL_S)
         except Exception:
             return out
         for entry in entries:
@@ -807,10 +1205,195 @@ class TorrentEngine:
             )
         return out
 
+    def _set_file_prio(self, file_index: int, prio: int) -> None:
+        """
+        Aplica a prioridade do arquivo só se ela mudou. Chamar com _prio_lock.
+        O libtorrent recalcula as prioridades de todas as pieces a partir das
+        prioridades de arquivo, então o espelho de pieces é invalidado.
+        """
+        if self._file_prio[file_index] == prio:
+            return
+        self.handle.file_priority(file_index, prio)
+        self._file_prio[file_index] = prio
+        self._piece_prio[:] = b"\xff" * len(self._piece_prio)
+
+    def _prioritize_files(self, prios: List[int]) -> None:
+        """
+        Envia o vetor inteiro de prioridades de arquivo numa chamada só;
+        sem prioritize_files(), cai para um file_priority() por arquivo.
+        Não atualiza o espelho _file_prio.
+        """
+        try:
+            self.handle.prioritize_files(prios)
+            return
+        except (AttributeError, TypeError):
+            pass
+        for i, prio in enumerate(prios):
+            self.handle.file_priority(i, prio)
+
+    def _set_piece_prios(self, pieces: Sequence[int], prio: int) -> List[int]:
+        """
+        Eleva a prioridade das pieces cujo valor espelhado é menor (ou
+        desconhecido); nunca rebaixa. Chamar com _prio_lock.
+        Retorna as pieces alteradas.
+
+        As mudanças vão numa única chamada prioritize_pieces() com pares
+        (piece, prioridade), em vez de um piece_priority() por piece.
+        """
+        mirror = self._piece_prio
+        changed = [p for p in pieces if not (0xFF != mirror[p] >= prio)]
+        if not changed:
+            return changed
+        batched = False
+        if len(changed) > 1 and self._batch_piece_prios:
+            try:
+                self.handle.prioritize_pieces([(p, prio) for p in changed])
+                batched = True
+            except (TypeError, AttributeError):
+                # builds antigos não aceitam pares: não tenta de novo
+                self._batch_piece_prios = False
+            except Exception:
+                pass
+        if not batched:
+            try:
+                piece_priority = self.handle.piece_priority
+                for p in changed:
+                    piece_priority(p, prio)
+            except Exception:
+                # alguns builds podem não expor piece_priority; nesse caso, só file_priority já ajuda
+                return []
+        for p in changed:
+            mirror[p] = prio
+        return changed
+
+    def _readahead_window(self, file_index: int, needed_pieces: range) -> List[Tuple[range, int]]:
+        """
+        Faixas de pieces à frente do read (limitadas ao fim do arquivo) com a
+        prioridade de cada uma: as mais próximas do read recebem mais.
+        """
+        if not self._readahead_pieces or not needed_pieces:
+            return []
+        start = needed_pieces.stop
+        end = min(start + self._readahead_pieces, self._file_pieces[file_index].stop)
+        window = []
+        for limit, prio in _READAHEAD_TIERS:
+            stop = end if limit is None else min(needed_pieces.start + limit, end)
+            if stop > start:
+                window.append((range(start, stop), prio))
+                start = stop
+        return window
+
+    def _reset_piece_deadlines(self, pieces: Sequence[int]) -> None:
+        """
+        Remove a deadline das pieces que não chegaram (ex.: read com timeout):
+        deadlines esquecidas mantêm o libtorrent reagendando-as sem parar.
+        O espelho volta a "desconhecida" para o próximo read reaplicar.
+
+        Pieces que outro read ainda aguarda (em _piece_waiters; o waiter deste
+        read já saiu do conjunto) mantêm a deadline: o timeout de um read não
+        derruba a urgência dos demais.
+        """
+        missing = self._missing_pieces(pieces)
+        if not missing:
+            return
+        for w in tuple(self._piece_waiters):
+            missing = [p for p in missing if p not in w.pieces]
+            if not missing:
+                return
+        with self._prio_lock:
+            for p in missing:
+                try:
+                    self.handle.reset_piece_deadline(p)
+                except Exception:
+                    pass
+                self._piece_prio[p] = 0xFF
+
+    def _set_piece_deadlines(self, pieces: Sequence[int], first: int) -> None:
+        """
+        Deadline crescente pela distância ao início do read: o libtorrent
+        trata essas pieces como time-critical e as pede antes das demais.
+        """
+        step = self._readahead_deadline_ms
+        try:
+            for p in pieces:
+                self.handle.set_piece_deadline(p, (p - first) * step)
+        except Exception:
+            pass
+
+    def _acquire_fd(self, file_index: int, stream: bool) -> List[int]:
+        """
+        Entrada [fd, usuários, advice] do arquivo, aberta se preciso. Deve ser
+        devolvida com _release_fd depois do pread.
+        """
+        with self._fd_lock:
+            if self._fds_closed:
+                raise RuntimeError("engine shut down")
+            entry = self._fd_cache.get(file_index)
+            if entry is None:
+                flags = os.O_RDONLY | getattr(os, "O_CLOEXEC", 0)
+                fd = os.open(self._real_path(file_index), flags)
+                entry = [fd, 1, _FADV_NORMAL]
+                self._fd_cache[file_index] = entry
+                self._evict_fds()
+            else:
+                self._fd_cache.move_to_end(file_index)
+                entry[1] += 1
+            # Streaming é lido em sequência: SEQUENTIAL dobra o readahead do
+            # kernel, cujas heurísticas se perdem com a escrita esparsa do
+            # libtorrent. Só chama o fadvise quando o modo do arquivo muda.
+            advice = _FADV_SEQUENTIAL if stream else _FADV_NORMAL
+            if advice is not None and entry[2] != advice:
+                try:
+                    os.posix_fadvise(entry[0], 0, 0, advice)
+                except OSError:
+                    pass
+                entry[2] = advice
+            return entry
+
+    def _release_fd(self, entry: List[int]) -> None:
+        with self._fd_lock:
+            entry[1] -= 1
+            if not self._fds_closed:
+                if len(self._fd_cache) > FD_CACHE_MAX:
+                    self._evict_fds()
+                return
+            if entry[1] > 0:
+                return
+        # Último usuário de um fd que estava em uso no shutdown
+        try:
+            os.close(entry[0])
+        except OSError:
+            pass
+
+    def _evict_fds(self) -> None:
+        # Chamado com _fd_lock. Fecha os menos recentes que não estão em uso;
+        # se todos estiverem, o cache passa do limite até o próximo release.
+        excess = len(self._fd_cache) - FD_CACHE_MAX
+        if excess <= 0:
+            return
+        idle = [fi for fi, entry in self._fd_cache.items() if entry[1] == 0][:excess]
+        for fi in idle:
+            try:
+                os.close(self._fd_cache.pop(fi)[0])
+            except OSError:
+                pass
+
+    def _close_fds(self) -> None:
+        # Fecha só os fds ociosos: fechar um fd no meio de um pread daria
+        # EBADF ou, com o número reaproveitado, bytes de outro arquivo. Os em
+        # uso ficam para o _release_fd.
+        with self._fd_lock:
+            self._fds_closed = True
+            fds = [entry[0] for entry in self._fd_cache.values() if entry[1] == 0]
+            self._fd_cache.clear()
+        for fd in fds:
+            try:
+                os.close(fd)
+            except OSError:
+                pass
 
     def _real_path(self, file_index: int) -> str:
-        rel = self.info.files().file_path(file_index)
-        return os.path.join(self.cache_dir, rel)
+        return self._real_paths[file_index]
 
     def _load_resume_data(self) -> Optional[bytes]:
         try:
@@ -825,106 +1408,220 @@ class TorrentEngine:
     def _write_resume_data(self, data) -> None:
         try:
             if isinstance(data, (bytes, bytearray, memoryview)):
-                out = bytes(data)
+                out = data
             else:
                 out = lt.bencode(data)
         except Exception:
             return
+        # Escrita direta no fd (sem buffer do objeto arquivo nem cópia do
+        # blob) e fsync antes do replace: um crash não deixa o resume truncado.
         tmp = f"{self._resume_path}.tmp"
-        with open(tmp, "wb") as f:
-            f.write(out)
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_CLOEXEC", 0), 0o644)
+        try:
+            view = memoryview(out)
+            while view:
+                view = view[os.write(fd, view) :]
+            os.fsync(fd)
+        finally:
+            os.close(fd)
         os.replace(tmp, self._resume_path)
 
     def _save_resume_data(self, timeout_s: float = 5.0) -> None:
+        # O resultado chega pela thread de alertas (_alert_loop).
+        self._resume_done.clear()
         try:
             self.handle.save_resume_data()
         except Exception:
             return
-        start = time.time()
-        alert_ok = getattr(lt, "save_resume_data_alert", None)
-        alert_fail = getattr(lt, "save_resume_data_failed_alert", None)
-        while (time.time() - start) < timeout_s:
-            alerts = self.ses.pop_alerts()
+        self._resume_done.wait(timeout_s)
+
+    def _alert_loop(self) -> None:
+        """
+        Único consumidor da fila de alertas da sessão.
+        - piece_finished_alert: acorda quem espera em _wait_pieces
+        - file_completed_alert: marca o arquivo em _file_done
+        - save_resume_data(_failed)_alert: grava o resume e libera _save_resume_data
+
+        Cada lote de pop_alerts() é despachado pelo tipo exato do alerta num
+        dict; os demais (status, erros, storage) custam uma consulta só.
+        """
+        kinds = {}
+        for name, kind in (
+            ("piece_finished_alert", _ALERT_PIECE_FINISHED),
+            ("file_completed_alert", _ALERT_FILE_COMPLETED),
+            ("save_resume_data_alert", _ALERT_RESUME_OK),
+            ("save_resume_data_failed_alert", _ALERT_RESUME_FAILED),
+        ):
+            cls = getattr(lt, name, None)
+            if cls is not None:
+                kinds[cls] = kind
+        while not self._alerts_stop.is_set():
+            try:
+                self.ses.wait_for_alert(500)
+                alerts = self.ses.pop_alerts()
+            except Exception:
+                time.sleep(0.5)
+                continue
+            finished = []
             for a in alerts:
-                if alert_fail and isinstance(a, alert_fail):
-                    return
-                if alert_ok and isinstance(a, alert_ok):
+                kind = kinds.get(type(a))
+                if kind is None:
+                    continue
+                if kind == _ALERT_PIECE_FINISHED:
+                    try:
+                        p = int(a.piece_index)
+                        self._have[p] = 1
+                        finished.append(p)
+                    except Exception:
+                        pass
+                elif kind == _ALERT_FILE_COMPLETED:
+                    try:
+                        self._file_done[int(a.index)] = 1
+                    except Exception:
+                        pass
+                elif kind == _ALERT_RESUME_OK:
                     try:
-                        self._write_resume_data(a.resume_data)
+                        self._queue_write(
+                            self._resume_path, self._write_resume_data, a.resume_data
+                        )
                     except Exception:
                         pass
+                    self._resume_done.set()
+                else:
+                    self._resume_done.set()
+            if finished:
+                # _have já foi marcado antes de sinalizar: o waiter limpa o
+                # evento e reconsulta, então não perde a notificação.
+                for w in tuple(self._piece_waiters):
+                    if not w.pieces.isdisjoint(finished):
+                        w.event.set()
+
+    def _queue_write(self, target: str, fn, arg) -> None:
+        """
+        Agenda fn(arg) na thread de gravação, substituindo uma gravação ainda
+        pendente do mesmo target. Após o shutdown, grava na hora.
+        """
+        with self._writes_cv:
+            if not self._writer_stop:
+                self._writes[target] = (fn, arg)
+                self._writes_cv.notify()
+                return
+        fn(arg)
+
+    def _writer_loop(self) -> None:
+        while True:
+            with self._writes_cv:
+                while not self._writes and not self._writer_stop:
+                    self._writes_cv.wait()
+                if not self._writes:
                     return
-            time.sleep(0.05)
+                writes = list(self._writes.values())
+                self._writes.clear()
+            for fn, arg in writes:
+                try:
+                    fn(arg)
+                except Exception:
+                    pass
+
+    def _flush_writes(self, timeout_s: float = 5.0) -> None:
+        # Grava o que estiver pendente e encerra a thread de gravação.
+        with self._writes_cv:
+            self._writer_stop = True
+            self._writes_cv.notify()
+        self._writer.join(timeout_s)
 
     def _resume_loop(self) -> None:
         while not self._resume_stop.is_set():
             self._resume_stop.wait(self._resume_save_interval_s)
             if self._resume_stop.is_set():
                 break
-            with self._lock:
+            with self._resume_lock:
                 self._save_resume_data()
 
     def _is_media_path(self, path: str) -> bool:
-        ext = os.path.splitext(path)[1].lower()
-        return ext in self._media_exts
+        # Equivale a os.path.splitext(path)[1] (ponto após o início do nome),
+        # sem o custo de splitext: só o sufixo do tamanho da maior extensão
+        # configurada é examinado.
+        dot = path.rfind(".", max(0, len(path) - self._media_ext_max_len))
+        if dot <= 0 or path[dot - 1] == "/":
+            return False
+        ext = path[dot:]
+        return "/" not in ext and ext.lower() in self._media_exts
 
     def is_media_path(self, path: str) -> bool:
+        # Arquivos do torrent já foram classificados no __init__
+        fi = self._path_to_fi.get(path)
+        if fi is not None:
+            return bool(self._file_is_media[fi])
         return self._is_media_path(path)
 
     def prefetch_bytes(self, path: str) -> int:
-        st = self.index.stat(path)
-        if st["type"] != "file":
-            raise IsADirectoryError(path)
-        fi = int(st["file_index"])
-        size = int(st["size"])
-        ranges = self._prefetch_ranges(self.info.files().file_path(fi), size)
-        return sum(length for _, length in ranges)
+        return self._prefetch_plan(self._file_index(path))[2]
 
     def prefetch_info(self, path: str) -> dict:
-        st = self.index.stat(path)
-        if st["type"] != "file":
-            raise IsADirectoryError(path)
-        fi = int(st["file_index"])
-        size = int(st["size"])
-        ranges = self._prefetch_ranges(self.info.files().file_path(fi), size)
-        pieces = set()
-        total_bytes = 0
-        for offset, length in ranges:
-            total_bytes += length
-            for p, _, _ in self._map_file(fi, offset, length):
-                pieces.add(p)
+        fi = self._file_index(path)
+        size = self._file_sizes[fi]
+        ranges, piece_ranges, total_bytes = self._prefetch_plan(fi)
+        pieces = sum(len(r) for r in piece_ranges)
         prefetch_pct = round((total_bytes / size) * 100.0, 2) if size > 0 else 0.0
         return {
             "path": path,
             "size": size,
             "prefetch_bytes": total_bytes,
-            "prefetch_pieces": len(pieces),
+            "prefetch_pieces": pieces,
             "prefetch_pct": prefetch_pct,
             "ranges": [{"offset": o, "length": l} for o, l in ranges],
         }
 
-    def _map_file(self, file_index: int, offset: int, size: int):
+    def _piece_range(self, file_index: int, offset: int, size: int) -> range:
         """
-        Normaliza o retorno de torrent_info.map_file().
+        Pieces que cobrem [offset, offset+size) do arquivo.
 
-        Pode retornar:
-        - um único peer_request
-        - ou uma lista de peer_request
+        Usa o offset global do arquivo (file_offset, que já inclui pad files)
+        em vez de torrent_info.map_file(), evitando alocar um peer_request por
+        piece a cada leitura.
         """
-
-        m = self.info.map_file(file_index, offset, size)
-
-        # Caso 1: retorno único (peer_request)
-        if hasattr(m, "piece"):
-            return [(int(m.piece), int(m.start), int(m.length))]
-
-        # Caso 2: iterável de peer_request
-        out = []
-        for req in m:
-            out.append((int(req.piece), int(req.start), int(req.length)))
-
+        if size <= 0:
+            return range(0)
+        start = self._file_offsets[file_index] + offset
+        plen = self._piece_len
+        return range(start // plen, (start + size - 1) // plen + 1)
+
+    def _prefetch_piece_ranges(
+        self, file_index: int, ranges: Sequence[Tuple[int, int]]
+    ) -> List[range]:
+        """
+        Ranges de pieces dos trechos de prefetch (em ordem de offset), unindo
+        os que se tocam para nenhuma piece aparecer duas vezes.
+        """
+        out: List[range] = []
+        for offset, length in ranges:
+            r = self._piece_range(file_index, offset, length)
+            if not r:
+                continue
+            if out and r.start <= out[-1].stop:
+                last = out[-1]
+                out[-1] = range(last.start, max(last.stop, r.stop))
+            else:
+                out.append(r)
         return out
 
+    def _prefetch_plan(self, file_index: int) -> Tuple[tuple, tuple, int]:
+        """
+        (ranges de bytes, ranges de pieces, total de bytes) do prefetch do
+        arquivo, calculado uma vez por arquivo.
+        """
+        plan = self._prefetch_plans.get(file_index)
+        if plan is None:
+            ranges = tuple(self._prefetch_ranges(file_index, self._file_sizes[file_index]))
+            plan = (
+                ranges,
+                tuple(self._prefetch_piece_ranges(file_index, ranges)),
+                sum(length for _, length in ranges),
+            )
+            self._prefetch_plans[file_index] = plan
+        return plan
+
     def _calc_prefetch_len(self, size: int, pct: float, min_b: int, max_b: int) -> int:
         if size <= 0:
             return 0
@@ -939,23 +1636,18 @@ class TorrentEngine:
             target = size
         return target
 
-    def _prefetch_ranges(self, path: str, size: int) -> List[Tuple[int, int]]:
-        is_media = self._is_media_path(path)
+    def _prefetch_ranges(self, file_index: int, size: int) -> Sequence[Tuple[int, int]]:
+        is_media = self._file_is_media[file_index]
         cfg = self._prefetch_cfg["media"] if is_media else self._prefetch_cfg["other"]
-        if is_media:
-            start_len = self._calc_prefetch_len(
-                size, cfg["start_pct"], cfg["start_min"], cfg["start_max"]
-            )
-            end_len = self._calc_prefetch_len(
-                size, cfg["end_pct"], cfg["end_min"], cfg["end_max"]
-            )
-        else:
-            start_len = self._calc_prefetch_len(
-                size, cfg["start_pct"], cfg["start_min"], cfg["start_max"]
-            )
-            end_len = self._calc_prefetch_len(
-                size, cfg["end_pct"], cfg["end_min"], cfg["end_max"]
-            )
+        start_len = self._calc_prefetch_len(
+            size, cfg["start_pct"], cfg["start_min"], cfg["start_max"]
+        )
+        if start_len >= size:
+            # Arquivo pequeno: o início já cobre tudo, sem montar a lista
+            return ((0, size),) if size > 0 else ()
+        end_len = self._calc_prefetch_len(
+            size, cfg["end_pct"], cfg["end_min"], cfg["end_max"]
+        )
 
         ranges = []
         if start_len > 0:
@@ -974,131 +1666,224 @@ class TorrentEngine:
         offset: int,
         size: int,
         mode: str,
-    ) -> List[int]:
+    ) -> range:
         """
         Define prioridades para pieces/arquivo necessárias ao read.
-        Retorna lista de piece indexes requeridas.
+        Retorna o range de piece indexes requeridas.
         """
-        mapping = self._map_file(file_index, offset, size)
-        needed_pieces = [p for (p, _, _) in mapping]
-
-        stream = (mode == "stream") or (
-            mode == "auto" and self._is_media_path(self.info.files().file_path(file_index))
-        )
-
-        # Sequential download ajuda muito vídeo/áudio
-        if stream:
-            self.handle.set_sequential_download(True)
-
-        # Prioriza o arquivo como um todo
-        self.handle.file_priority(file_index, 7 if stream else 1)
-
-        # Prioriza as pieces necessárias (alto)
-        for p in needed_pieces:
-            try:
-                self.handle.piece_priority(p, 7)
-            except Exception:
-                # alguns builds podem não expor piece_priority; nesse caso, só file_priority já ajuda
-                pass
+        needed_pieces = self._piece_range(file_index, offset, size)
+
+        stream = (mode == "stream") or (mode == "auto" and self._file_is_media[file_index])
+        # Com readahead, o streaming prioriza só a janela à frente do read;
+        # o resto do arquivo fica com prioridade base (exceto se pinado).
+        window = self._readahead_window(file_index, needed_pieces) if stream else []
+        if stream and not (window and file_index not in self._pinned_files):
+            file_prio = 7
+        else:
+            file_prio = 1
+
+        # Caminho rápido, sem lock: nada mudou desde o último read.
+        mirror = self._piece_prio
+        if (
+            self._file_prio[file_index] == file_prio
+            and (self._sequential or not stream)
+            and all(0xFF != mirror[p] >= 7 for p in needed_pieces)
+            and all(0xFF != mirror[p] >= prio for r, prio in window for p in r)
+        ):
+            return needed_pieces
+
+        with self._prio_lock:
+            # Sequential download ajuda muito vídeo/áudio
+            if stream and not self._sequential:
+                self.handle.set_sequential_download(True)
+                self._sequential = True
+
+            # Prioriza o arquivo como um todo
+            self._set_file_prio(file_index, file_prio)
+
+            # Prioriza as pieces necessárias (alto) e a janela de readahead
+            urgent = self._set_piece_prios(needed_pieces, 7)
+            for r, prio in window:
+                changed = self._set_piece_prios(r, prio)
+                if prio == 7:
+                    urgent += changed
+            if urgent and self._readahead_deadline_ms:
+                self._set_piece_deadlines(urgent, needed_pieces.start)
 
         return needed_pieces
 
-    def _wait_pieces(self, needed_pieces: List[int], deadline_s: Optional[float] = None) -> None:
+    def _pieces_bitfield(self, max_age_s: float = 0.0):
+        """
+        Bitfield de pieces do libtorrent (status com query_pieces), ou None.
+        Com max_age_s > 0 reaproveita o último bitfield buscado há menos
+        que isso.
+        """
+        cached = self._pieces_cache
+        now = time.monotonic()
+        if max_age_s > 0 and cached is not None and now - cached[0] < max_age_s:
+            return cached[1]
+        try:
+            flag = getattr(lt.torrent_handle, "query_pieces", None)
+            st = self.handle.status(flag) if flag is not None else self.handle.status()
+            bf = st.pieces
+        except Exception:
+            return None
+        if len(bf) < self.info.num_pieces():
+            return None
+        self._pieces_cache = (now, bf)
+        return bf
+
+    def _missing_pieces(self, pieces: Sequence[int], max_age_s: float = 0.0) -> List[int]:
+        """
+        Filtra as pieces ainda não baixadas.
+        Primeiro pelo bitfield local (_have, alimentado pela thread de alertas
+        e pelas consultas anteriores); só o que falta vai ao libtorrent.
+        Para listas grandes, busca o bitfield inteiro numa única chamada
+        (status com query_pieces) em vez de um have_piece por piece;
+        max_age_s permite reaproveitar um bitfield recente (ver
+        _pieces_bitfield).
+        """
+        have = self._have
+        pieces = [p for p in pieces if not have[p]]
+        if not pieces:
+            return pieces
+        missing = None
+        if len(pieces) > _BITFIELD_MIN_PIECES:
+            bf = self._pieces_bitfield(max_age_s)
+            if bf is not None:
+                missing = [p for p in pieces if not bf[p]]
+        if missing is None:
+            have_piece = self.handle.have_piece
+            missing = [p for p in pieces if not have_piece(p)]
+        if len(missing) < len(pieces):
+            # Pieces baixadas não voltam a faltar: guarda para as próximas consultas
+            for p in set(pieces).difference(missing):
+                have[p] = 1
+        return missing
+
+    def _wait_pieces(self, needed_pieces: Sequence[int], deadline_s: Optional[float] = None) -> None:
         """
         Bloqueia até todas as pieces em needed_pieces estarem disponíveis.
         deadline_s: se não None, levanta TimeoutError após esse tempo.
-        """
-        start = time.time()
-        # loop leve
-        while True:
-            missing = 0
-            for p in needed_pieces:
-                if not self.handle.have_piece(p):
-                    missing += 1
-            if missing == 0:
-                return
 
-            if deadline_s is not None and (time.time() - start) > deadline_s:
-                raise TimeoutError("Timeout waiting for pieces")
+        Sem polling: cada read registra um evento próprio, que a thread de
+        alertas só sinaliza quando chega uma piece que ele aguarda; só as
+        pieces ainda faltantes são reconsultadas. A espera é limitada a 1 s
+        por volta, por segurança (alertas descartados por fila cheia, pieces
+        vindas de check/resume), ou a 20 ms em builds sem piece_finished_alert.
+        """
+        missing = self._missing_pieces(needed_pieces)
+        if not missing:
+            return
 
-            time.sleep(0.02)
+        deadline = None if deadline_s is None else time.monotonic() + deadline_s
+        waiter = _PieceWaiter()
+        waiter.pieces = frozenset(missing)
+        self._piece_waiters.add(waiter)
+        try:
+            while True:
+                waiter.event.clear()
+                missing = self._missing_pieces(missing)
+                if not missing:
+                    return
+                waiter.pieces = frozenset(missing)
+                wait_s = self._piece_wait_s
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError("Timeout waiting for pieces")
+                    wait_s = min(wait_s, remaining)
+                waiter.event.wait(wait_s)
+        finally:
+            self._piece_waiters.discard(waiter)
 
     # -----------------------------
     # API usada pelo RPC / FUSE / CLI
     # -----------------------------
     def list_dir(self, path: str = "") -> List[dict]:
-        with self._lock:
-            return self.index.list_dir(path)
+        return self.index.list_dir(path)
+
+    def _file_index(self, path: str) -> int:
+        """
+        file_index do arquivo em path. FileNotFoundError se não existe,
+        IsADirectoryError se é diretório.
+        """
+        fi = self._path_to_fi.get(path)
+        if fi is not None:
+            return fi
+        st = self.index.stat(path)
+        if st["type"] != "file":
+            raise IsADirectoryError(path)
+        return int(st["file_index"])
 
     def stat(self, path: str) -> dict:
-        with self._lock:
-            return self.index.stat(path)
+        return self.index.stat(path)
 
     def pin(self, path: str) -> None:
         """
         Pinar = priorizar arquivo inteiro (download total com o tempo)
         O download efetivo acontece conforme swarm/peers; o daemon mantém sessão viva e seedará.
         """
-        with self._lock:
-            st = self.index.stat(path)
-            if st["type"] != "file":
-                raise IsADirectoryError(path)
-            fi = int(st["file_index"])
-            self.handle.file_priority(fi, 7)
+        with self._lock.writing():
+            fi = self._file_index(path)
+            with self._prio_lock:
+                self._set_file_prio(fi, 7)
             self._pinned_files.add(fi)
             self._pinned_paths.add(path)
             self._save_pins()
 
     def unpin(self, path: str) -> None:
-        with self._lock:
-            st = self.index.stat(path)
-            if st["type"] != "file":
-                raise IsADirectoryError(path)
-            fi = int(st["file_index"])
-            try:
-                self.handle.file_priority(fi, 0)
-            except Exception:
-                pass
+        with self._lock.writing():
+            fi = self._file_index(path)
+            with self._prio_lock:
+                try:
+                    self._set_file_prio(fi, 0)
+                except Exception:
+                    pass
             self._pinned_files.discard(fi)
             self._pinned_paths.discard(path)
             self._save_pins()
 
     def list_pins(self) -> List[dict]:
-        with self._lock:
-            try:
-                file_progress = self.handle.file_progress()
-            except Exception:
-                file_progress = None
-            items = []
-            for fi in sorted(self._pinned_files):
-                path = self.info.files().file_path(fi)
-                size = int(self.info.files().file_size(fi))
-                downloaded = 0
-                if file_progress is not None and fi < len(file_progress):
-                    downloaded = int(file_progress[fi])
-                status = "complete" if size > 0 and downloaded >= size else "downloading"
-                progress = float(downloaded / size) if size > 0 else 0.0
-                remaining = max(size - downloaded, 0)
-                progress_pct = round(progress * 100.0, 2)
-                items.append(
-                    {
-                        "path": path,
-                        "file_name": os.path.basename(path),
-                        "torrent_name": self.info.name(),
-                        "size": size,
-                        "downloaded": downloaded,
-                        "remaining": remaining,
-                        "progress": progress,
-                        "progress_pct": progress_pct,
-                        "status": status,
-                    }
-                )
-            return items
+        # Só a cópia dos pins precisa do lock; as chamadas ao libtorrent e a
+        # montagem da resposta ficam fora dele.
+        with self._lock.reading():
+            pinned = sorted(self._pinned_files)
+        try:
+            file_progress = self._file_progress()
+        except Exception:
+            file_progress = None
+        torrent_name = self.info.name()
+        items = []
+        for fi in pinned:
+            path = self._rel_paths[fi]
+            size = self._file_sizes[fi]
+            downloaded = 0
+            if file_progress is not None and fi < len(file_progress):
+                downloaded = int(file_progress[fi])
+            status = "complete" if size > 0 and downloaded >= size else "downloading"
+            progress = float(downloaded / size) if size > 0 else 0.0
+            remaining = max(size - downloaded, 0)
+            progress_pct = round(progress * 100.0, 2)
+            items.append(
+                {
+                    "path": path,
+                    "file_name": os.path.basename(path),
+                    "torrent_name": torrent_name,
+                    "size": size,
+                    "downloaded": downloaded,
+                    "remaining": remaining,
+                    "progress": progress,
+                    "progress_pct": progress_pct,
+                    "status": status,
+                }
+            )
+        return items
 
     def _load_pins(self) -> None:
         try:
-            with open(self._pins_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
+            with open(self._pins_path, "rb") as f:
+                data = _json_loads(f.read())
         except FileNotFoundError:
             return
         except Exception:
@@ -1112,18 +1897,28 @@ class TorrentEngine:
             if not isinstance(path, str):
                 continue
             try:
-                st = self.index.stat(path)
+                fi = self._file_index(path)
             except Exception:
                 continue
-            if st.get("type") != "file":
-                continue
-            fi = int(st["file_index"])
             self._pinned_files.add(fi)
             self._pinned_paths.add(path)
-            self.handle.file_priority(fi, 7)
+        if not self._pinned_files:
+            return
+
+        # Todos os pins vão num único prioritize_files()
+        with self._prio_lock:
+            prios = list(self._file_prio)
+            for fi in self._pinned_files:
+                prios[fi] = 7
+            self._prioritize_files(prios)
+            self._file_prio[:] = bytes(prios)
+            self._piece_prio[:] = b"\xff" * len(self._piece_prio)
 
     def _save_pins(self) -> None:
-        data = {"paths": sorted(self._pinned_paths)}
+        self._queue_write(self._pins_path, self._write_pins, sorted(self._pinned_paths))
+
+    def _write_pins(self, paths: List[str]) -> None:
+        data = {"paths": paths}
         tmp_path = f"{self._pins_path}.tmp"
         with open(tmp_path, "w", encoding="utf-8") as f:
             json.dump(data, f, ensure_ascii=False)
@@ -1148,127 +1943,205 @@ class TorrentEngine:
           - None = espera indefinida
           - float = limite de espera por pieces
         """
-        with self._lock:
-            st = self.index.stat(path)
-            if st["type"] != "file":
-                raise IsADirectoryError(path)
+        fi, offset, size = self._prepare_read(path, offset, size, mode, timeout_s)
+        if fi is None:
+            return b""
 
-            fi = int(st["file_index"])
-            fsize = int(st["size"])
+        # Lê do arquivo materializado no cache, com um pread no fd cacheado.
+        # Observação: o arquivo pode não existir ainda se nenhuma piece foi baixada;
+        # mas como esperamos have_piece, normalmente ele já estará criado.
+        stream = self._is_stream_read(fi, mode)
+        entry = self._acquire_fd(fi, stream)
+        try:
+            fd = entry[0]
+            data = os.pread(fd, size, offset)
+            if stream and self._drop_behind and _FADV_DONTNEED is not None:
+                # Streaming não relê o trecho: libera as páginas do page cache
+                try:
+                    os.posix_fadvise(fd, offset, len(data), _FADV_DONTNEED)
+                except OSError:
+                    pass
+        finally:
+            self._release_fd(entry)
+        return data
 
-            if offset < 0 or size < 0:
-                raise ValueError("offset/size must be >= 0")
-            if offset >= fsize:
-                return b""
-            size = min(size, fsize - offset)
+    def open_read(
+        self,
+        path: str,
+        offset: int,
+        size: int,
+        mode: str = "auto",
+        timeout_s: Optional[float] = None,
+    ) -> Optional[_CacheRead]:
+        """
+        Como read(), mas em vez dos bytes devolve o arquivo do cache aberto
+        para o trecho, já com as pieces disponíveis, para o servidor enviar
+        direto do disco (sendfile). O size é limitado ao tamanho atual do
+        arquivo em disco. Retorna None para leitura além do fim; o chamador
+        fecha o retorno com close() depois do envio.
+        """
+        fi, offset, size = self._prepare_read(path, offset, size, mode, timeout_s)
+        if fi is None:
+            return None
+        stream = self._is_stream_read(fi, mode)
+        f = open(self._real_path(fi), "rb")
+        try:
+            fd = f.fileno()
+            size = max(min(size, os.fstat(fd).st_size - offset), 0)
+            # A advice de readahead vale por descritor aberto: precisa ir no
+            # arquivo que o sendfile lê, não nos fds cacheados de read().
+            if stream and _FADV_SEQUENTIAL is not None:
+                try:
+                    os.posix_fadvise(fd, 0, 0, _FADV_SEQUENTIAL)
+                except OSError:
+                    pass
+        except BaseException:
+            f.close()
+            raise
+        return _CacheRead(f, offset, size, stream and self._drop_behind)
 
-            # Ajusta prioridades e obtém lista de pieces necessárias.
-            needed_pieces = self._prioritize_for_read(fi, offset, size, mode=mode)
-            rp = self._real_path(fi)
+    def _is_stream_read(self, file_index: int, mode: str) -> bool:
+        return mode == "stream" or (mode == "auto" and bool(self._file_is_media[file_index]))
 
-        # Bloqueia até pieces chegarem (para FUSE isso é esperado)
-        self._wait_pieces(needed_pieces, deadline_s=timeout_s)
+    def _prepare_read(
+        self,
+        path: str,
+        offset: int,
+        size: int,
+        mode: str,
+        timeout_s: Optional[float],
+    ) -> Tuple[Optional[int], int, int]:
+        """
+        Valida o trecho, prioriza e espera as pieces. Retorna
+        (file_index, offset, size), ou (None, offset, 0) além do fim.
+        """
+        fi = self._file_index(path)
+        fsize = self._file_sizes[fi]
 
-        # Lê do arquivo materializado no cache
-        # Observação: o arquivo pode não existir ainda se nenhuma piece foi baixada;
-        # mas como esperamos have_piece, normalmente ele já estará criado.
-        with open(rp, "rb") as f:
-            f.seek(offset)
-            return f.read(size)
+        if offset < 0 or size < 0:
+            raise ValueError("offset/size must be >= 0")
+        if offset >= fsize:
+            return None, offset, 0
+        size = min(size, fsize - offset)
 
-    def prefetch(self, path: str) -> None:
-        with self._lock:
-            st = self.index.stat(path)
-            if st["type"] != "file":
-                raise IsADirectoryError(path)
+        # Ajusta prioridades e obtém lista de pieces necessárias.
+        needed_pieces = self._prioritize_for_read(fi, offset, size, mode=mode)
 
-            fi = int(st["file_index"])
-            fsize = int(st["size"])
-            ranges = self._prefetch_ranges(self.info.files().file_path(fi), fsize)
+        # Bloqueia até pieces chegarem (para FUSE isso é esperado)
+        try:
+            self._wait_pieces(needed_pieces, deadline_s=timeout_s)
+        except TimeoutError:
+            self._reset_piece_deadlines(needed_pieces)
+            raise
+        return fi, offset, size
 
-            pieces = set()
-            for offset, length in ranges:
-                for p, _, _ in self._map_file(fi, offset, length):
-                    pieces.add(p)
+    def prefetch(self, path: str) -> None:
+        with self._lock.writing():
+            piece_ranges = self._prefetch_plan(self._file_index(path))[1]
 
-            for p in pieces:
-                try:
-                    self.handle.piece_priority(p, 6)
-                except Exception:
-                    pass
+            with self._prio_lock:
+                for pieces in piece_ranges:
+                    self._set_piece_prios(pieces, 6)
 
     def status(self) -> dict:
-        with self._lock:
+        """
+        Resumo do torrent. O resultado é compartilhado por até
+        STATUS_CACHE_TTL_S entre chamadas e não deve ser modificado.
+        """
+        cached = self._status_cache
+        now = time.monotonic()
+        if cached is not None and now - cached[0] < STATUS_CACHE_TTL_S:
+            return cached[1]
+        st = self._read_status()
+        self._status_cache = (now, st)
+        return st
+
+    def _read_status(self) -> dict:
+        # Sem flags query_*: o libtorrent não copia bitfield, nome etc.;
+        # num_pieces já traz a contagem de pieces baixadas.
+        try:
+            s = self.handle.status(0)
+        except Exception:
             s = self.handle.status()
-            pieces_total = int(self.info.num_pieces())
-            pieces_done = 0
-            try:
-                pieces_done = sum(1 for p in s.pieces if p)
-            except Exception:
+        pieces_total = int(self.info.num_pieces())
+        pieces_done = getattr(s, "num_pieces", None)
+        if pieces_done is not None:
+            pieces_done = int(pieces_done)
+        else:
+            # Bitfield compartilhado com reads/file_info (uma chamada só).
+            # O bitfield do libtorrent só itera bools: copia uma vez num
+            # bytearray e conta em C, sem gerador Python por piece.
+            bf = self._pieces_bitfield(STATUS_CACHE_TTL_S)
+            if bf is not None:
+                pieces_done = bf.count(True) if isinstance(bf, list) else bytearray(bf).count(1)
+            else:
                 pieces_done = int(round(float(s.progress) * pieces_total)) if pieces_total > 0 else 0
-            pieces_missing = max(pieces_total - pieces_done, 0)
-            state_str = str(s.state)
-            checking = state_str == "checking_files"
-            checking_progress = float(s.progress) if checking else None
-            return {
-                "name": self.info.name(),
-                "progress": float(s.progress),
-                "peers": int(s.num_peers),
-                "seeds": int(getattr(s, "num_seeds", 0)),
-                "pieces_total": pieces_total,
-                "pieces_done": pieces_done,
-                "pieces_missing": pieces_missing,
-                "downloaded": int(s.total_download),
-                "uploaded": int(s.total_upload),
-                "download_rate": int(s.download_rate),
-                "upload_rate": int(s.upload_rate),
-                "state": state_str,
-                "checking": checking,
-                "checking_progress": checking_progress,
-            }
+        pieces_missing = max(pieces_total - pieces_done, 0)
+        state_str = str(s.state)
+        checking = state_str == "checking_files"
+        checking_progress = float(s.progress) if checking else None
+        return {
+            "name": self.info.name(),
+            "progress": float(s.progress),
+            "peers": int(s.num_peers),
+            "seeds": int(getattr(s, "num_seeds", 0)),
+            "pieces_total": pieces_total,
+            "pieces_done": pieces_done,
+            "pieces_missing": pieces_missing,
+            "downloaded": int(s.total_download),
+            "uploaded": int(s.total_upload),
+            "download_rate": int(s.download_rate),
+            "upload_rate": int(s.upload_rate),
+            "state": state_str,
+            "checking": checking,
+            "checking_progress": checking_progress,
+        }
 
     def downloading_files(self, max_files: Optional[int] = None) -> List[dict]:
-        with self._lock:
-            try:
-                progress = self.handle.file_progress()
-            except Exception:
-                return []
-            try:
-                priorities = list(self.handle.file_priorities())
-            except Exception:
-                priorities = []
-
-            items = []
-            files = self.info.files()
-            total_files = files.num_files()
-            for fi in range(total_files):
-                size = int(files.file_size(fi))
-                if size <= 0:
-                    continue
-                downloaded = int(progress[fi]) if fi < len(progress) else 0
-                if downloaded >= size:
-                    continue
-                prio = priorities[fi] if fi < len(priorities) else 0
-                if prio <= 0:
-                    continue
-                remaining = max(size - downloaded, 0)
-                pct = round((downloaded / size) * 100.0, 2) if size > 0 else 0.0
-                items.append(
-                    {
-                        "path": files.file_path(fi),
-                        "size": size,
-                        "downloaded": downloaded,
-                        "remaining": remaining,
-                        "progress_pct": pct,
-                        "priority": prio,
-                    }
-                )
-                if max_files and len(items) >= max_files:
-                    break
-            return items
+        # Sem _lock: só usa o layout imutável do __init__ e chamadas ao
+        # libtorrent, que é thread-safe.
+        try:
+            progress = self._file_progress()
+        except Exception:
+            return []
+        try:
+            priorities = list(self.handle.file_priorities())
+        except Exception:
+            priorities = []
+
+        items = []
+        # Nomes locais: o laço passa por todos os arquivos do torrent
+        rel_paths = self._rel_paths
+        sizes = self._file_sizes
+        progress_len = len(progress)
+        # Arquivos com prioridade 0 não baixam: nem olha o progresso deles
+        for fi, prio in enumerate(priorities):
+            if prio <= 0:
+                continue
+            size = sizes[fi]
+            if size <= 0:
+                continue
+            downloaded = int(progress[fi]) if fi < progress_len else 0
+            if downloaded >= size:
+                continue
+            remaining = max(size - downloaded, 0)
+            pct = round((downloaded / size) * 100.0, 2) if size > 0 else 0.0
+            items.append(
+                {
+                    "path": rel_paths[fi],
+                    "size": size,
+                    "downloaded": downloaded,
+                    "remaining": remaining,
+                    "progress_pct": pct,
+                    "priority": prio,
+                }
+            )
+            if max_files and len(items) >= max_files:
+                break
+        return items
 
     def peers(self) -> List[dict]:
-        with self._lock:
+        with self._lock.reading():
             try:
                 peers = list(self.handle.get_peer_info())
             except Exception:
@@ -1319,20 +2192,24 @@ class TorrentEngine:
         return out
 
     def reannounce(self) -> None:
-        with self._lock:
+        with self._lock.writing():
+            if not self.handle.is_valid():
+                return
             try:
                 self.handle.force_reannounce()
-            except Exception:
-                pass
-            try:
                 self.handle.force_dht_announce()
-            except Exception:
+            except RuntimeError:
+                # Handle invalidado depois do is_valid (torrent removido)
                 pass
 
     def shutdown(self) -> None:
         self._resume_stop.set()
-        with self._lock:
+        # A espera pelo save_resume_data_alert não segura as RPCs; o _lock só
+        # cobre o pause/remove. A gravação sai em _flush_writes.
+        with self._resume_lock:
             self._save_resume_data()
+        with self._lock.writing():
+            self._alerts_stop.set()
             try:
                 self.handle.pause()
             except Exception:
@@ -1341,24 +2218,41 @@ class TorrentEngine:
                 self.ses.remove_torrent(self.handle)
             except Exception:
                 pass
+        self._flush_writes()
+        self._close_fds()
 
     def file_info(self, path: str) -> dict:
-        with self._lock:
-            st = self.index.stat(path)
-            if st["type"] != "file":
-                raise IsADirectoryError(path)
-            fi = int(st["file_index"])
-            size = int(st["size"])
-            pieces = set()
-            for p, _, _ in self._map_file(fi, 0, size):
-                pieces.add(p)
-            pieces_total = len(pieces)
-            pieces_done = 0
-            for p in pieces:
-                if self.handle.have_piece(p):
-                    pieces_done += 1
-            pieces_missing = max(pieces_total - pieces_done, 0)
-        return {
+        """
+        Pieces do arquivo (total/baixadas/faltando). O resultado de um arquivo
+        completo não muda mais e é reaproveitado; não deve ser modificado.
+        """
+        cached = self._file_info_done.get(path)
+        if cached is not None:
+            return cached
+        fi = self._file_index(path)
+        size = self._file_sizes[fi]
+        pieces = self._file_pieces[fi]
+        pieces_total = len(pieces)
+        # As pieces do arquivo são contíguas: conta direto na fatia do
+        # bitfield local e, se faltar algo, na do bitfield do libtorrent
+        # (count em C, sem loop Python por piece).
+        pieces_done = self._have.count(1, pieces.start, pieces.stop)
+        if pieces_done < pieces_total:
+            bf = None
+            if pieces_total > _BITFIELD_MIN_PIECES:
+                bf = self._pieces_bitfield(PIECES_CACHE_TTL_S)
+            if bf is not None:
+                if isinstance(bf, list):
+                    bf_done = bf[pieces.start : pieces.stop].count(True)
+                else:
+                    # Proxy de bitfield: uma cópia em bytearray, contada na
+                    # faixa sem fatiar de novo
+                    bf_done = bytearray(bf).count(1, pieces.start, pieces.stop)
+                pieces_done = max(pieces_done, bf_done)
+            else:
+                pieces_done = pieces_total - len(self._missing_pieces(pieces))
+        pieces_missing = pieces_total - pieces_done
+        info = {
             "path": path,
             "size": size,
             "file_index": fi,
@@ -1366,27 +2260,66 @@ class TorrentEngine:
             "pieces_done": pieces_done,
             "pieces_missing": pieces_missing,
         }
+        if not pieces_missing:
+            self._file_info_done[path] = info
+        return info
+
+    def _file_progress(self) -> list:
+        """
+        file_progress() do libtorrent, reaproveitado por até
+        FILE_PROGRESS_CACHE_TTL_S. Não deve ser modificado.
+        """
+        cached = self._file_progress_cache
+        now = time.monotonic()
+        if cached is not None and now - cached[0] < FILE_PROGRESS_CACHE_TTL_S:
+            return cached[1]
+        progress = self.handle.file_progress()
+        self._file_progress_cache = (now, progress)
+        return progress
 
     def files_completion(self) -> Optional[tuple[int, int]]:
-        with self._lock:
+        """
+        (arquivos completos, total). Depois da carga inicial a contagem vem
+        de _file_done, mantido por file_completed_alert, sem consultar o
+        libtorrent a cada chamada.
+        """
+        # Sem _lock: ver downloading_files.
+        done = self._file_done
+        if not self._file_done_seeded:
+            # Só interessa se o arquivo está completo: piece_granularity poupa
+            # o libtorrent de somar os blocos das pieces incompletas.
             try:
-                progress = self.handle.file_progress()
+                flag = getattr(lt.torrent_handle, "piece_granularity", None)
+                if flag is not None:
+                    progress = self.handle.file_progress(flag)
+                else:
+                    progress = self._file_progress()
             except Exception:
                 return None
-            files = self.info.files()
-            total_files = files.num_files()
-            done = 0
-            for fi in range(total_files):
-                size = int(files.file_size(fi))
-                if size <= 0:
-                    done += 1
-                    continue
-                downloaded = int(progress[fi]) if fi < len(progress) else 0
-                if downloaded >= size:
-                    done += 1
-            return done, total_files
+            # Vazios já estão marcados. map com operator.ge compara as duas
+            # listas em C, sem laço Python.
+            for fi in itertools.compress(
+                range(len(progress)), map(operator.ge, progress, self._file_sizes)
+            ):
+                done[fi] = 1
+            # Arquivos já presentes (resume, checagem) não geram alerta: só
+            # confia nos alertas depois que o checking terminou.
+            try:
+                state = str(self.status().get("state", ""))
+            except Exception:
+                state = ""
+            if state and "checking" not in state:
+                self._file_done_seeded = True
+        return done.count(1), len(done)
 
     def config(self) -> dict:
+        """
+        Config efetiva do engine. Não muda após o __init__, então é montada
+        uma vez lá; o resultado é compartilhado e não deve ser modificado.
+        """
+        return self._config_info
+
+    def _build_config_info(self) -> dict:
         return {
             "config_path": self._config_path,
             "max_metadata_bytes": self._max_metadata_bytes,
@@ -1396,6 +2329,9 @@ class TorrentEngine:
             "skip_check": self._skip_check,
             "resume_save_interval_s": self._resume_save_interval_s,
             "checking_max_active": self._checking_max_active,
+            "readahead_pieces": self._readahead_pieces,
+            "readahead_deadline_ms": self._readahead_deadline_ms,
+            "readahead_drop_behind": self._drop_behind,
         }
 
     def infohash(self) -> dict:
@@ -1504,6 +2440,19 @@ def _is_private_torrent(info: lt.torrent_info) -> bool:
     return False
 
 
+@functools.lru_cache(maxsize=512)
+def _tracker_host_port(url: str) -> Optional[Tuple[str, int]]:
+    """
+    (hostname, porta) da url de tracker, ou None sem um dos dois. As mesmas
+    urls passam várias vezes pelos helpers de trackers; cada uma é parseada
+    uma vez.
+    """
+    parsed = urllib.parse.urlparse(url)
+    if parsed.hostname and parsed.port:
+        return parsed.hostname, parsed.port
+    return None
+
+
 def _add_tracker_url(handle: lt.torrent_handle, url: str) -> None:
     try:
         handle.add_tracker({"url": url})
@@ -1,16 +1,19 @@
 from __future__ import annotations
 
-from dataclasses import dataclass, field
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, List, Optional, Tuple
 
 
-@dataclass
 class _Node:
-    name: str
-    is_dir: bool
-    children: Dict[str, "_Node"] = field(default_factory=dict)
-    file_index: Optional[int] = None
-    size: int = 0
+    # Um node por arquivo/diretório: sem __dict__ por instância, e arquivos
+    # não carregam um dict de filhos vazio.
+    __slots__ = ("name", "is_dir", "children", "file_index", "size")
+
+    def __init__(self, name: str, is_dir: bool) -> None:
+        self.name = name
+        self.is_dir = is_dir
+        self.children: Optional[Dict[str, _Node]] = {} if is_dir else None
+        self.file_index: Optional[int] = None
+        self.size = 0
 
 
 def _normalize(path: str) -> str:
@@ -21,12 +24,21 @@ def _normalize(path: str) -> str:
 
 class PathIndex:
     """
-    Árvores leves para mapear paths do torrent em O(parts) para list/stat.
+    Árvores leves para mapear paths do torrent para list/stat.
     Mantém apenas metadados mínimos (tipo, size, file_index).
+    Cada node também fica num dict pelo path normalizado ("a/b/c"), então
+    resolver um path é uma única consulta, sem descer a árvore.
     """
 
     def __init__(self) -> None:
         self.root = _Node(name="", is_dir=True)
+        self._by_path: Dict[str, _Node] = {"": self.root}
+        # True enquanto os filhos de cada diretório estão em ordem de nome
+        # (índice montado só via build()); list_dir então não precisa ordenar.
+        self._sorted = True
+        # Listagens já montadas por diretório, após freeze(). None = índice
+        # ainda mutável (sem memo).
+        self._listing: Optional[Dict[str, List[dict]]] = None
 
     def add_file(self, path: str, file_index: int, size: int) -> None:
         """
@@ -38,41 +50,120 @@ class PathIndex:
 
         parts = path.split("/")
         cur = self.root
+        prefix = ""
         for part in parts[:-1]:
-            cur = cur.children.setdefault(part, _Node(name=part, is_dir=True))
+            prefix = f"{prefix}/{part}" if prefix else part
+            nxt = cur.children.get(part)
+            if nxt is None:
+                nxt = _Node(name=part, is_dir=True)
+                cur.children[part] = nxt
+                self._by_path[prefix] = nxt
+            elif nxt.children is None:
+                nxt.children = {}
+            cur = nxt
 
         leaf_name = parts[-1]
         leaf = cur.children.get(leaf_name)
         if leaf is None:
             leaf = _Node(name=leaf_name, is_dir=False)
             cur.children[leaf_name] = leaf
+            self._by_path[path] = leaf
         leaf.is_dir = False
         leaf.file_index = int(file_index)
         leaf.size = int(size)
+        self._sorted = False
+        self._listing = None
+
+    def build(self, entries: Iterable[Tuple[str, int, int]]) -> None:
+        """
+        Registra vários arquivos (path, file_index, size) de uma vez.
+
+        Ordena pelos componentes do path e reaproveita a cadeia de diretórios
+        da entrada anterior, então cada diretório é resolvido uma única vez.
+        Num índice vazio os filhos ficam em ordem de nome.
+        """
+        was_sorted = self._sorted and not self.root.children
+        items = []
+        for path, file_index, size in entries:
+            path = _normalize(path)
+            if not path:
+                raise ValueError("path vazio não é permitido")
+            items.append((path, path.split("/"), int(file_index), int(size)))
+        items.sort(key=lambda it: it[1])
+
+        by_path = self._by_path
+        prev: List[str] = []
+        chain = [self.root]
+        keys = [""]
+        for path, parts, file_index, size in items:
+            dirs = parts[:-1]
+            common = 0
+            limit = min(len(prev), len(dirs))
+            while common < limit and prev[common] == dirs[common]:
+                common += 1
+            del chain[common + 1 :]
+            del keys[common + 1 :]
+            cur = chain[-1]
+            for part in dirs[common:]:
+                key = f"{keys[-1]}/{part}" if keys[-1] else part
+                nxt = cur.children.get(part)
+                if nxt is None:
+                    nxt = _Node(name=part, is_dir=True)
+                    cur.children[part] = nxt
+                    by_path[key] = nxt
+                elif nxt.children is None:
+                    nxt.children = {}
+                cur = nxt
+                chain.append(cur)
+                keys.append(key)
+            prev = dirs
+
+            leaf_name = parts[-1]
+            leaf = cur.children.get(leaf_name)
+            if leaf is None:
+                leaf = _Node(name=leaf_name, is_dir=False)
+                cur.children[leaf_name] = leaf
+                by_path[path] = leaf
+            leaf.is_dir = False
+            leaf.file_index = file_index
+            leaf.size = size
+        self._sorted = was_sorted
+        self._listing = None
+
+    def freeze(self) -> None:
+        """
+        Marca o índice como completo: a partir daqui list_dir monta cada
+        listagem uma única vez e devolve sempre a mesma lista (compartilhada,
+        não deve ser modificada). Um add_file/build posterior desfaz o memo.
+        """
+        if self._listing is None:
+            self._listing = {}
 
     def _walk(self, path: str) -> _Node:
         """
-        Navega até o node do path ou lança FileNotFoundError.
+        Resolve o node do path ou lança FileNotFoundError.
         """
         path = _normalize(path)
-        if not path:
-            return self.root
-
-        cur = self.root
-        for part in path.split("/"):
-            nxt = cur.children.get(part)
-            if nxt is None:
-                raise FileNotFoundError(path)
-            cur = nxt
-        return cur
+        node = self._by_path.get(path)
+        if node is None:
+            raise FileNotFoundError(path)
+        return node
 
     def list_dir(self, path: str = "") -> List[dict]:
+        listing = self._listing
+        if listing is not None:
+            entries = listing.get(_normalize(path))
+            if entries is not None:
+                return entries
         node = self._walk(path)
         if not node.is_dir:
             raise NotADirectoryError(path)
 
+        children = node.children.items()
+        if not self._sorted:
+            children = sorted(children, key=lambda kv: kv[0])
         entries = []
-        for name, child in sorted(node.children.items(), key=lambda kv: kv[0]):
+        for name, child in children:
             entries.append(
                 {
                     "name": name,
@@ -80,6 +171,8 @@ class PathIndex:
                     "size": 0 if child.is_dir else child.size,
                 }
             )
+        if listing is not None:
+            listing[_normalize(path)] = entries
         return entries
 
     def stat(self, path: str) -> dict:
@@ -5,12 +5,51 @@ import os
 from common.rpc import (
     recv_json,
     send_json,
-    send_bytes,
+    send_json_with_bytes,
+    send_json_with_file,
 )
 
 from .manager import TorrentManager
 
 MAX_READ_BYTES = 4 * 1024 * 1024
+MAX_READ_BATCH_BYTES = 16 * 1024 * 1024
+
+
+class _ReplyAborted(Exception):
+    """
+    A resposta já começou a sair (cabeçalho com data_len) e não pode ser
+    completada: a conexão é fechada, já que qualquer frame de erro seria
+    lido pelo cliente como os bytes prometidos.
+    """
+
+
+def _error_message(e: Exception) -> str:
+    """
+    Texto de erro enviado ao cliente para uma exceção: usado pela resposta
+    de cada comando e pelos itens de um read-batch.
+    """
+    if isinstance(e, KeyError):
+        err = e.args[0] if e.args else "UnknownError"
+        if str(err).startswith("TorrentNotFound:"):
+            return "Torrent nao encontrado. Use 'torrents' para listar."
+        return str(err)
+    if isinstance(e, ValueError):
+        err = str(e)
+        if err.startswith("TorrentNameAmbiguous:"):
+            name = err.split(":", 1)[1]
+            return f"Nome de torrent ambiguo: {name}. Use --torrent com o ID."
+        if err == "TorrentRequired":
+            return "Torrent obrigatorio. Use --torrent ou escolha um ID."
+        if err == "ReadSizeInvalid":
+            return "Tamanho de leitura invalido."
+        return err
+    if isinstance(e, FileNotFoundError):
+        return "FileNotFound"
+    if isinstance(e, NotADirectoryError):
+        return "NotADirectory"
+    if isinstance(e, IsADirectoryError):
+        return "IsADirectory"
+    return f"{type(e).__name__}: {e}"
 
 
 class TorrentFSServer:
@@ -18,6 +57,59 @@ class TorrentFSServer:
         self.socket_path = socket_path
         self.manager = manager
 
+    async def _read_batch(self, engine, reads: list, mode: str, timeout_s):
+        """
+        Executa os reads de um read-batch em paralelo.
+        Falhas são reportadas por item; o lote em si só falha na validação.
+        """
+
+        async def _one(r: dict):
+            try:
+                data = await asyncio.to_thread(
+                    engine.read,
+                    r["path"],
+                    int(r.get("offset", 0)),
+                    int(r.get("size", 0)),
+                    mode,
+                    timeout_s,
+                )
+            except Exception as e:
+                return {"ok": False, "error": _error_message(e)}, b""
+            return {"ok": True, "data_len": len(data)}, data
+
+        return await asyncio.gather(*(_one(r) for r in reads))
+
+    async def _send_read_from_file(
+        self, writer, req_id, engine, path: str, offset: int, size: int, mode: str, timeout_s
+    ) -> None:
+        """
+        Responde um read enviando os bytes direto do arquivo de cache.
+        A espera de pieces, o open e o fstat rodam numa thread (open_read); o
+        data_len já vem limitado ao tamanho atual do arquivo em disco, para o
+        cabeçalho nunca prometer mais bytes do que o sendfile vai entregar.
+        Falhas antes do cabeçalho viram resposta de erro normal; depois dele,
+        levantam _ReplyAborted.
+        """
+        read = await asyncio.to_thread(engine.open_read, path, offset, size, mode, timeout_s)
+        if read is None:
+            await send_json_with_bytes(writer, {"id": req_id, "ok": True, "data_len": 0}, ())
+            return
+        try:
+            try:
+                await send_json_with_file(
+                    writer,
+                    {"id": req_id, "ok": True, "data_len": read.size},
+                    read.file,
+                    read.offset,
+                    read.size,
+                )
+            except Exception as e:
+                raise _ReplyAborted() from e
+            if read.drop_behind:
+                await asyncio.to_thread(read.drop_sent)
+        finally:
+            read.close()
+
     def _get_engine_from_req(self, req: dict):
         torrent = req.get("torrent")
         if not torrent:
@@ -36,10 +128,54 @@ class TorrentFSServer:
                 cmd = req.get("cmd")
 
                 try:
+                    # -----------------------------
+                    # Leitura (caminho quente: testado antes dos demais comandos)
+                    # -----------------------------
+                    if cmd == "read":
+                        engine = self._get_engine_from_req(req)
+
+                        path = req["path"]
+                        offset = int(req.get("offset", 0))
+                        size = int(req.get("size", 0))
+                        mode = req.get("mode", "auto")
+
+                        timeout_s = req.get("timeout_s")
+                        if timeout_s is not None:
+                            timeout_s = float(timeout_s)
+
+                        if size < 0 or size > MAX_READ_BYTES:
+                            raise ValueError("ReadSizeInvalid")
+
+                        if hasattr(engine, "open_read"):
+                            await self._send_read_from_file(
+                                writer, req_id, engine, path, offset, size, mode, timeout_s
+                            )
+                            continue
+
+                        data = await asyncio.to_thread(
+                            engine.read,
+                            path,
+                            offset,
+                            size,
+                            mode,
+                            timeout_s,
+                        )
+
+                        # Cabeçalho JSON seguido dos bytes crus, numa escrita só
+                        await send_json_with_bytes(
+                            writer,
+                            {
+                                "id": req_id,
+                                "ok": True,
+                                "data_len": len(data),
+                            },
+                            (data,) if data else (),
+                        )
+
                     # -----------------------------
                     # Meta / controle
                     # -----------------------------
-                    if cmd == "hello":
+                    elif cmd == "hello":
                         # Mantém compatibilidade: retorna info do daemon + torrents disponíveis
                         resp = {
                             "id": req_id,
@@ -285,42 +421,40 @@ class TorrentFSServer:
                             {"id": req_id, "ok": True, "trackers": status},
                         )
 
-                    elif cmd == "read":
+                    elif cmd == "read-batch":
                         engine = self._get_engine_from_req(req)
 
-                        path = req["path"]
-                        offset = int(req.get("offset", 0))
-                        size = int(req.get("size", 0))
+                        reads = req.get("reads") or []
                         mode = req.get("mode", "auto")
 
                         timeout_s = req.get("timeout_s")
                         if timeout_s is not None:
                             timeout_s = float(timeout_s)
 
-                        if size < 0 or size > MAX_READ_BYTES:
+                        total = 0
+                        for r in reads:
+                            size = int(r.get("size", 0))
+                            if size < 0 or size > MAX_READ_BYTES:
+                                raise ValueError("ReadSizeInvalid")
+                            total += size
+                        if total > MAX_READ_BATCH_BYTES:
                             raise ValueError("ReadSizeInvalid")
 
-                        data = await asyncio.to_thread(
-                            engine.read,
-                            path,
-                            offset,
-                            size,
-                            mode,
-                            timeout_s,
-                        )
+                        results = await self._read_batch(engine, reads, mode, timeout_s)
+                        chunks = [data for _, data in results if data]
 
-                        # Envia cabeçalho JSON
-                        await send_json(
+                        # Cabeçalho JSON com um resultado por read, na ordem do pedido,
+                        # seguido dos bytes crus concatenados na mesma ordem
+                        await send_json_with_bytes(
                             writer,
                             {
                                 "id": req_id,
                                 "ok": True,
-                                "data_len": len(data),
+                                "results": [res for res, _ in results],
+                                "data_len": sum(len(c) for c in chunks),
                             },
+                            chunks,
                         )
-                        # Envia bytes crus
-                        if data:
-                            await send_bytes(writer, data)
 
                     else:
                         await send_json(
@@ -332,57 +466,12 @@ class TorrentFSServer:
                             },
                         )
 
-                except KeyError as e:
-                    err = e.args[0] if e.args else "UnknownError"
-                    if str(err).startswith("TorrentNotFound:"):
-                        msg = "Torrent nao encontrado. Use 'torrents' para listar."
-                    else:
-                        msg = str(err)
-                    await send_json(
-                        writer,
-                        {"id": req_id, "ok": False, "error": msg},
-                    )
-                except ValueError as e:
-                    err = str(e)
-                    if err.startswith("TorrentNameAmbiguous:"):
-                        name = err.split(":", 1)[1]
-                        msg = (
-                            f"Nome de torrent ambiguo: {name}. "
-                            "Use --torrent com o ID."
-                        )
-                    elif err == "TorrentRequired":
-                        msg = "Torrent obrigatorio. Use --torrent ou escolha um ID."
-                    elif err == "ReadSizeInvalid":
-                        msg = "Tamanho de leitura invalido."
-                    else:
-                        msg = err
-                    await send_json(
-                        writer,
-                        {"id": req_id, "ok": False, "error": msg},
-                    )
-                except FileNotFoundError:
-                    await send_json(
-                        writer,
-                        {"id": req_id, "ok": False, "error": "FileNotFound"},
-                    )
-                except NotADirectoryError:
-                    await send_json(
-                        writer,
-                        {"id": req_id, "ok": False, "error": "NotADirectory"},
-                    )
-                except IsADirectoryError:
-                    await send_json(
-                        writer,
-                        {"id": req_id, "ok": False, "error": "IsADirectory"},
-                    )
+                except _ReplyAborted:
+                    break
                 except Exception as e:
                     await send_json(
                         writer,
-                        {
-                            "id": req_id,
-                            "ok": False,
-                            "error": f"{type(e).__name__}: {e}",
-                        },
+                        {"id": req_id, "ok": False, "error": _error_message(e)},
                     )
 
         except (asyncio.IncompleteReadError, ConnectionResetError):
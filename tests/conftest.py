@@ -0,0 +1,17 @@
+import os
+import sys
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Scripts manuais: rodam contra um .torrent real em torrents/ ao serem
+# importados, não são testes do pytest.
+collect_ignore = ["test_list_files.py", "test_read_file.py"]
+
+# daemon.engine importa libtorrent no topo do módulo. Os testes daqui só
+# exercitam partes em Python puro; sem o binding instalado, um módulo vazio
+# basta para o import.
+try:
+    import libtorrent  # noqa: F401
+except Exception:
+    sys.modules["libtorrent"] = types.ModuleType("libtorrent")
@@ -0,0 +1,162 @@
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+from cli import main as cli_main
+from daemon.index import PathIndex
+from daemon.server import TorrentFSServer
+
+
+def _content(path: str, size: int) -> bytes:
+    seed = path.encode()
+    return (seed * (size // len(seed) + 1))[:size]
+
+
+class _Engine:
+    """
+    Engine de mentira sobre um índice real. fail_at: offset cujo read falha
+    (depois de fail_delay_s, para os blocos seguintes chegarem antes).
+    """
+
+    def __init__(self, files: dict, fail_at=None, fail_delay_s=0.0):
+        self.files = files
+        self.index = PathIndex()
+        self.index.build((p, i, s) for i, (p, s) in enumerate(files.items()))
+        self.fail_at = fail_at
+        self.fail_delay_s = fail_delay_s
+        self.calls = []
+
+    def stat(self, path):
+        return self.index.stat(path)
+
+    def list_dir(self, path):
+        return self.index.list_dir(path)
+
+    def read(self, path, offset, size, mode="auto", timeout_s=None):
+        fsize = self.index.stat(path)["size"]
+        if offset == self.fail_at:
+            time.sleep(self.fail_delay_s)
+            raise OSError("falha de leitura")
+        return _content(path, fsize)[offset : offset + size]
+
+    def _record(self, cmd, path):
+        self.calls.append((cmd, path))
+        if path.endswith(".bad"):
+            raise OSError("falha")
+
+    def pin(self, path):
+        self._record("pin", path)
+
+    def unpin(self, path):
+        self._record("unpin", path)
+
+    def prefetch(self, path):
+        self._record("prefetch", path)
+
+
+class _Manager:
+    def __init__(self, engine):
+        self.engine = engine
+
+    def get_engine(self, torrent):
+        return self.engine
+
+
+@pytest.fixture
+def daemon(tmp_path):
+    """Sobe um TorrentFSServer numa thread; devolve uma função que o liga a um engine."""
+    state = {}
+
+    def start(engine):
+        path = str(tmp_path / "d.sock")
+        ready = threading.Event()
+
+        def serve():
+            async def main():
+                loop = asyncio.get_running_loop()
+                state["stop"] = stop = loop.create_future()
+                state["loop"] = loop
+                srv = await asyncio.start_unix_server(
+                    TorrentFSServer(path, _Manager(engine)).handle_client, path=path
+                )
+                ready.set()
+                await stop
+                srv.close()
+                await srv.wait_closed()
+
+            asyncio.run(main())
+
+        state["thread"] = t = threading.Thread(target=serve, daemon=True)
+        t.start()
+        assert ready.wait(5)
+        return path
+
+    yield start
+    if "thread" in state:
+        state["loop"].call_soon_threadsafe(state["stop"].set_result, None)
+        state["thread"].join(5)
+
+
+def _run_cli(monkeypatch, capsys, sock, *argv):
+    monkeypatch.setattr(sys, "argv", ["torrentfs", "--socket", sock, "--torrent", "t", "--json", *argv])
+    cli_main.main()
+    return json.loads(capsys.readouterr().out)
+
+
+def test_cp_failed_read_leaves_only_written_prefix(daemon, monkeypatch, capsys, tmp_path):
+    chunk = 4096
+    size = 8 * chunk
+    engine = _Engine({"f.bin": size}, fail_at=2 * chunk, fail_delay_s=0.2)
+    sock = daemon(engine)
+    dest = tmp_path / "out.bin"
+
+    out = _run_cli(
+        monkeypatch, capsys, sock,
+        "cp", "f.bin", str(dest), "--chunk-size", str(chunk), "--fixed-chunk", "--no-progress",
+    )
+
+    assert not out["ok"] and out["errors"][0]["path"] == "f.bin"
+    # os blocos depois do que falhou chegaram, mas o destino não fica com
+    # o tamanho do original (nem com buracos zerados)
+    assert out["copied_bytes"] > 2 * chunk
+    assert dest.read_bytes() == _content("f.bin", size)[: 2 * chunk]
+
+
+def test_cp_copies_whole_file(daemon, monkeypatch, capsys, tmp_path):
+    size = 3 * 4096 + 17
+    sock = daemon(_Engine({"d/f.bin": size}))
+    dest = tmp_path / "out.bin"
+
+    out = _run_cli(monkeypatch, capsys, sock, "cp", "d/f.bin", str(dest), "--chunk-size", "4096", "--no-progress")
+
+    assert out["ok"] and out["copied_bytes"] == size
+    assert dest.read_bytes() == _content("d/f.bin", size)
+    assert os.path.getsize(dest) == size
+
+
+@pytest.mark.parametrize("cmd,key", [("prefetch", "prefetched"), ("unpin-dir", "unpinned")])
+def test_walk_max_files_in_tree_order(daemon, monkeypatch, capsys, cmd, key):
+    engine = _Engine({"top/a/3.bin": 1, "top/b.bin": 1, "top/a/deep/9.bin": 1})
+    sock = daemon(engine)
+
+    out = _run_cli(monkeypatch, capsys, sock, cmd, "top", "--max-files", "2")
+
+    assert out[key] == 2
+    assert [p for _, p in engine.calls] == ["top/a/3.bin", "top/a/deep/9.bin"]
+
+
+@pytest.mark.parametrize("cmd,key", [("prefetch", "prefetched"), ("unpin-dir", "unpinned")])
+def test_walk_max_files_counts_only_successes(daemon, monkeypatch, capsys, cmd, key):
+    engine = _Engine({"top/a/1.bad": 1, "top/a/2.bin": 1, "top/b.bin": 1})
+    sock = daemon(engine)
+
+    out = _run_cli(monkeypatch, capsys, sock, cmd, "top", "--max-files", "1")
+
+    assert out[key] == 1
+    assert [e["path"] for e in out["errors"]] == ["top/a/1.bad"]
+    assert [p for _, p in engine.calls] == ["top/a/1.bad", "top/a/2.bin"]
@@ -0,0 +1,176 @@
+import threading
+import time
+
+import pytest
+
+from daemon.engine import (
+    TorrentEngine,
+    _RWLock,
+    _flatten_cfg,
+    _get_cfg,
+    _tracker_host_port,
+)
+
+
+# -----------------------------
+# Config
+# -----------------------------
+def test_flatten_cfg():
+    cfg = {"a": {"b": 1, "c.d": 2, 3: 4}, "e": [1]}
+    flat = _flatten_cfg(cfg)
+    assert flat == {"a": cfg["a"], "a.b": 1, "e": [1]}
+
+
+def test_get_cfg_walks_nested_dict():
+    cfg = {"a": {"b": {"c": 5}}, "x": 1}
+    assert _get_cfg(cfg, "a.b.c", None) == 5
+    assert _get_cfg(cfg, "a.b", None) == {"c": 5}
+    assert _get_cfg(cfg, "a.z", "dflt") == "dflt"
+    assert _get_cfg(cfg, "x.y", "dflt") == "dflt"
+    assert _get_cfg(None, "a", "dflt") == "dflt"
+
+
+def test_get_cfg_uses_flat_table():
+    cfg = {"a": {"b": 1}}
+    cfg["_flat"] = _flatten_cfg({"a": {"b": 2}})
+    # com o índice achatado, a árvore não é consultada
+    assert _get_cfg(cfg, "a.b", None) == 2
+    assert _get_cfg(cfg, "a.z", "dflt") == "dflt"
+
+
+# -----------------------------
+# Trackers
+# -----------------------------
+def test_tracker_host_port():
+    assert _tracker_host_port("udp://tracker.example:1337/announce") == ("tracker.example", 1337)
+    assert _tracker_host_port("https://Tracker.Example:443/a") == ("tracker.example", 443)
+    assert _tracker_host_port("http://tracker.example/announce") is None
+    assert _tracker_host_port("not a url") is None
+
+
+def _prune(urls):
+    return TorrentEngine._prune_udp_when_http_present(None, urls)
+
+
+def test_prune_udp_when_http_present():
+    urls = [
+        "udp://a.example:80/announce",
+        "http://a.example:80/announce",
+        "udp://a.example:6969/announce",
+        "udp://b.example:80/announce",
+        "https://c.example:443/announce",
+        "udp://c.example:443",
+    ]
+    assert _prune(urls) == [
+        "http://a.example:80/announce",
+        "udp://a.example:6969/announce",
+        "udp://b.example:80/announce",
+        "https://c.example:443/announce",
+    ]
+
+
+def test_prune_udp_without_http_keeps_list():
+    urls = ["udp://a.example:80/announce", "udp://b.example:80/announce"]
+    assert _prune(urls) is urls
+    # http sem porta não casa com nenhum udp
+    urls = ["http://a.example/announce", "udp://a.example:80/announce"]
+    assert _prune(urls) == urls
+
+
+# -----------------------------
+# _RWLock
+# -----------------------------
+def _hold(ctx, entered: threading.Event, release: threading.Event, log=None, name=None):
+    def run():
+        with ctx():
+            if log is not None:
+                log.append(name)
+            entered.set()
+            release.wait(5)
+
+    t = threading.Thread(target=run, daemon=True)
+    t.start()
+    return t
+
+
+def _wait_until(cond, timeout=2.0):
+    end = time.monotonic() + timeout
+    while not cond():
+        if time.monotonic() > end:
+            return False
+        time.sleep(0.001)
+    return True
+
+
+def test_rwlock_readers_share():
+    lock = _RWLock()
+    entered, release = threading.Event(), threading.Event()
+    t = _hold(lock.reading, entered, release)
+    assert entered.wait(2)
+    entered2 = threading.Event()
+    t2 = _hold(lock.reading, entered2, release)
+    assert entered2.wait(2)
+    release.set()
+    t.join(2)
+    t2.join(2)
+
+
+def test_rwlock_writer_excludes_readers():
+    lock = _RWLock()
+    r_in, r_out = threading.Event(), threading.Event()
+    reader = _hold(lock.reading, r_in, r_out)
+    assert r_in.wait(2)
+
+    w_in, w_out = threading.Event(), threading.Event()
+    writer = _hold(lock.writing, w_in, w_out)
+    assert not w_in.wait(0.05)
+    r_out.set()
+    assert w_in.wait(2)
+
+    r2_in, r2_out = threading.Event(), threading.Event()
+    reader2 = _hold(lock.reading, r2_in, r2_out)
+    assert not r2_in.wait(0.05)
+    w_out.set()
+    assert r2_in.wait(2)
+    r2_out.set()
+    for t in (reader, writer, reader2):
+        t.join(2)
+
+
+def test_rwlock_waiting_writer_goes_first():
+    lock = _RWLock()
+    log = []
+    r_in, r_out = threading.Event(), threading.Event()
+    reader = _hold(lock.reading, r_in, r_out, log, "r1")
+    assert r_in.wait(2)
+
+    w_in, release = threading.Event(), threading.Event()
+    writer = _hold(lock.writing, w_in, release, log, "w")
+    assert _wait_until(lambda: lock._writers_waiting == 1)
+
+    # writer na fila: um reader novo espera, mesmo com outro reader ativo
+    r2_in = threading.Event()
+    reader2 = _hold(lock.reading, r2_in, release, log, "r2")
+    assert not r2_in.wait(0.05)
+
+    r_out.set()
+    assert w_in.wait(2)
+    release.set()
+    assert r2_in.wait(2)
+    for t in (reader, writer, reader2):
+        t.join(2)
+    assert log == ["r1", "w", "r2"]
+
+
+def test_rwlock_releases_on_error():
+    lock = _RWLock()
+    with pytest.raises(RuntimeError):
+        with lock.writing():
+            raise RuntimeError("x")
+    with pytest.raises(RuntimeError):
+        with lock.reading():
+            raise RuntimeError("x")
+    done = threading.Event()
+    t = _hold(lock.writing, done, done)
+    assert done.wait(2)
+    t.join(2)
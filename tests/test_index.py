@@ -0,0 +1,99 @@
+import pytest
+
+from daemon.engine import _FallbackPathIndex
+from daemon.index import PathIndex
+
+ENTRIES = [
+    ("show/s1/ep2.mkv", 1, 200),
+    ("show/s1/ep1.mkv", 0, 100),
+    ("docs/readme.txt", 3, 10),
+    ("show/extra.nfo", 2, 5),
+    ("top.bin", 4, 7),
+]
+
+
+def _names(entries):
+    return [(e["name"], e["type"], e["size"]) for e in entries]
+
+
+@pytest.fixture(params=[PathIndex, _FallbackPathIndex], ids=["PathIndex", "fallback"])
+def index_cls(request):
+    return request.param
+
+
+def test_build_lists_in_name_order(index_cls):
+    idx = index_cls()
+    idx.build(ENTRIES)
+    assert _names(idx.list_dir("")) == [
+        ("docs", "dir", 0),
+        ("show", "dir", 0),
+        ("top.bin", "file", 7),
+    ]
+    assert _names(idx.list_dir("show")) == [("extra.nfo", "file", 5), ("s1", "dir", 0)]
+    assert _names(idx.list_dir("/show/s1/")) == [("ep1.mkv", "file", 100), ("ep2.mkv", "file", 200)]
+
+
+def test_build_matches_add_file(index_cls):
+    built = index_cls()
+    built.build(ENTRIES)
+    added = index_cls()
+    for path, fi, size in ENTRIES:
+        added.add_file(path, fi, size)
+    for path in ("", "show", "show/s1", "docs"):
+        assert built.list_dir(path) == added.list_dir(path)
+    for path, fi, size in ENTRIES:
+        assert built.stat(path) == added.stat(path) == {"type": "file", "size": size, "file_index": fi}
+
+
+def test_stat_and_errors(index_cls):
+    idx = index_cls()
+    idx.build(ENTRIES)
+    assert idx.stat("show") == {"type": "dir", "size": 0}
+    with pytest.raises(FileNotFoundError):
+        idx.stat("nope")
+    with pytest.raises(FileNotFoundError):
+        idx.list_dir("show/nope")
+    with pytest.raises(NotADirectoryError):
+        idx.list_dir("top.bin")
+
+
+def test_build_rejects_empty_path(index_cls):
+    with pytest.raises(ValueError):
+        index_cls().build([("/", 0, 1)])
+
+
+def test_build_normalizes_slashes(index_cls):
+    idx = index_cls()
+    idx.build([("/a/b.bin/", 0, 1)])
+    assert idx.stat("a/b.bin")["file_index"] == 0
+    assert _names(idx.list_dir("a")) == [("b.bin", "file", 1)]
+
+
+def test_freeze_memoizes_list_dir(index_cls):
+    idx = index_cls()
+    idx.build(ENTRIES)
+    idx.freeze()
+    first = idx.list_dir("show")
+    assert idx.list_dir("show") is first
+    assert idx.list_dir("/show/") is first
+
+
+def test_add_file_after_build_is_listed(index_cls):
+    idx = index_cls()
+    idx.build(ENTRIES)
+    idx.freeze()
+    before = idx.list_dir("show")
+    idx.add_file("show/a.srt", 9, 3)
+    after = idx.list_dir("show")
+    assert after is not before
+    assert _names(after) == [("a.srt", "file", 3), ("extra.nfo", "file", 5), ("s1", "dir", 0)]
+    # listagem já devolvida não muda por baixo de quem a guardou
+    assert _names(before) == [("extra.nfo", "file", 5), ("s1", "dir", 0)]
+
+
+def test_build_into_populated_index_keeps_order(index_cls):
+    idx = index_cls()
+    idx.add_file("b/z.bin", 0, 1)
+    idx.build([("b/a.bin", 1, 2), ("a.bin", 2, 3)])
+    assert [e["name"] for e in idx.list_dir("")] == ["a.bin", "b"]
+    assert [e["name"] for e in idx.list_dir("b")] == ["a.bin", "z.bin"]
@@ -0,0 +1,158 @@
+import asyncio
+
+import pytest
+
+from cli.client import close_pools, rpc_call, rpc_call_stream
+from common.rpc import ConnectionPool, recv_json, send_json, send_json_with_bytes
+
+
+class _FakeDaemon:
+    """
+    Daemon mínimo: responde {"ok": True, "cmd": ...} e, para "read", 4 bytes.
+    drop_on: (conexão, pedido) em que a conexão é fechada logo após ler o
+    pedido, sem responder (como um daemon reiniciado).
+    close_after_reply: fecha cada conexão depois da primeira resposta.
+    """
+
+    def __init__(self, path, drop_on=None, close_after_reply=False):
+        self.path = path
+        self.drop_on = drop_on
+        self.close_after_reply = close_after_reply
+        self.received = []
+        self.connections = 0
+        self._server = None
+
+    async def __aenter__(self):
+        self._server = await asyncio.start_unix_server(self._handle, path=self.path)
+        return self
+
+    async def __aexit__(self, *exc):
+        await close_pools()
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        conn = self.connections
+        n = 0
+        try:
+            while True:
+                req = await recv_json(reader)
+                n += 1
+                self.received.append(req["cmd"])
+                if self.drop_on == (conn, n):
+                    break
+                if req["cmd"] == "read":
+                    await send_json_with_bytes(
+                        writer, {"id": req["id"], "ok": True, "data_len": 4}, (b"abcd",)
+                    )
+                else:
+                    await send_json(writer, {"id": req["id"], "ok": True, "cmd": req["cmd"]})
+                if self.close_after_reply:
+                    break
+        except asyncio.IncompleteReadError:
+            pass
+        finally:
+            writer.close()
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+@pytest.fixture
+def sock(tmp_path):
+    return str(tmp_path / "d.sock")
+
+
+def test_pool_reuses_released_connection(sock):
+    async def main():
+        async with _FakeDaemon(sock):
+            pool = ConnectionPool(sock, max_idle=1)
+            r1, w1, reused = await pool.acquire()
+            assert not reused
+            r2, w2, _ = await pool.acquire()
+            pool.release(r1, w1)
+            # acima de max_idle: fechada em vez de guardada
+            pool.release(r2, w2)
+            assert w2.is_closing()
+            r3, w3, reused = await pool.acquire()
+            assert reused and w3 is w1
+            pool.release(r3, w3)
+            await pool.close()
+            assert w1.is_closing()
+
+    _run(main())
+
+
+def test_pool_skips_idle_connection_closed_by_daemon(sock):
+    async def main():
+        async with _FakeDaemon(sock, close_after_reply=True):
+            pool = ConnectionPool(sock)
+            reader, writer, _ = await pool.acquire()
+            await send_json(writer, {"id": "1", "cmd": "status"})
+            await recv_json(reader)
+            pool.release(reader, writer)
+            await asyncio.sleep(0.05)  # EOF do daemon chega ao reader
+            _, w2, reused = await pool.acquire()
+            assert not reused and w2 is not writer
+            w2.close()
+
+    _run(main())
+
+
+def test_rpc_call_reuses_connection(sock):
+    async def main():
+        async with _FakeDaemon(sock) as d:
+            for _ in range(3):
+                resp, _ = await rpc_call(sock, {"cmd": "status"})
+                assert resp["ok"]
+            resp, data = await rpc_call(sock, {"cmd": "read"}, want_bytes=True)
+            assert data == b"abcd"
+            assert d.connections == 1
+
+    _run(main())
+
+
+def test_rpc_call_retries_safe_cmd_on_stale_connection(sock):
+    async def main():
+        async with _FakeDaemon(sock, drop_on=(1, 2)) as d:
+            await rpc_call(sock, {"cmd": "status"})
+            resp, _ = await rpc_call(sock, {"cmd": "list"})
+            assert resp == {"id": resp["id"], "ok": True, "cmd": "list"}
+            assert d.received == ["status", "list", "list"]
+            assert d.connections == 2
+
+    _run(main())
+
+
+def test_rpc_call_does_not_resend_mutating_cmd(sock):
+    async def main():
+        async with _FakeDaemon(sock, drop_on=(1, 2)) as d:
+            await rpc_call(sock, {"cmd": "status"})
+            with pytest.raises((ConnectionError, asyncio.IncompleteReadError)):
+                await rpc_call(sock, {"cmd": "pin"})
+            assert d.received == ["status", "pin"]
+
+    _run(main())
+
+
+def test_rpc_call_stream_is_not_retried(sock):
+    async def main():
+        async with _FakeDaemon(sock, drop_on=(1, 2)) as d:
+            await rpc_call(sock, {"cmd": "status"})
+            got = []
+            with pytest.raises((ConnectionError, asyncio.IncompleteReadError)):
+                await rpc_call_stream(sock, {"cmd": "read"}, got.append)
+            assert d.received == ["status", "read"]
+            assert got == []
+
+    _run(main())
+
+
+def test_rpc_call_without_daemon(sock):
+    async def main():
+        await rpc_call(sock, {"cmd": "status"})
+
+    with pytest.raises(FileNotFoundError):
+        _run(main())
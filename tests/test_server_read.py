@@ -0,0 +1,122 @@
+import asyncio
+
+import pytest
+
+from cli.client import close_pools, rpc_call
+from daemon.server import MAX_READ_BATCH_BYTES, MAX_READ_BYTES, TorrentFSServer
+
+
+_ERRORS = {
+    "missing": FileNotFoundError("missing"),
+    "dir": IsADirectoryError("dir"),
+    "slow": TimeoutError("Timeout waiting for pieces"),
+    "bad": ValueError("ReadSizeInvalid"),
+}
+
+
+class _Engine:
+    """Engine de mentira: cada read devolve `size` bytes b"x"; sem open_read."""
+
+    def __init__(self):
+        self.reads = []
+
+    def read(self, path, offset, size, mode="auto", timeout_s=None):
+        self.reads.append((path, offset, size))
+        if path in _ERRORS:
+            raise _ERRORS[path]
+        return b"x" * size
+
+
+class _Manager:
+    def __init__(self, engine):
+        self.engine = engine
+
+    def get_engine(self, torrent):
+        if torrent != "t":
+            raise KeyError(f"TorrentNotFound:{torrent}")
+        return self.engine
+
+
+@pytest.fixture
+def call(tmp_path):
+    """Executa um pedido contra um TorrentFSServer real num socket unix."""
+    engine = _Engine()
+    path = str(tmp_path / "d.sock")
+
+    def run(payload):
+        async def main():
+            server = TorrentFSServer(path, _Manager(engine))
+            srv = await asyncio.start_unix_server(server.handle_client, path=path)
+            try:
+                return await rpc_call(path, dict(payload, torrent="t"), want_bytes=True)
+            finally:
+                await close_pools()
+                srv.close()
+                await srv.wait_closed()
+
+        return asyncio.run(main())
+
+    run.engine = engine
+    return run
+
+
+def test_read_batch_returns_results_in_order(call):
+    resp, data = call(
+        {
+            "cmd": "read-batch",
+            "reads": [
+                {"path": "a", "offset": 0, "size": 3},
+                {"path": "missing", "size": 1},
+                {"path": "b", "offset": 5, "size": 2},
+            ],
+        }
+    )
+    assert resp["ok"]
+    assert resp["results"] == [
+        {"ok": True, "data_len": 3},
+        {"ok": False, "error": "FileNotFound"},
+        {"ok": True, "data_len": 2},
+    ]
+    assert resp["data_len"] == 5 and data == b"xxxxx"
+
+
+def test_read_batch_at_limits(call):
+    per_read = MAX_READ_BATCH_BYTES // MAX_READ_BYTES
+    reads = [{"path": "a", "offset": 0, "size": MAX_READ_BYTES}] * per_read
+    resp, data = call({"cmd": "read-batch", "reads": reads})
+    assert resp["ok"] and len(data) == MAX_READ_BATCH_BYTES
+
+
+@pytest.mark.parametrize(
+    "sizes",
+    [
+        [MAX_READ_BYTES + 1],
+        [-1],
+        [1, MAX_READ_BYTES + 1],
+        [MAX_READ_BYTES] * (MAX_READ_BATCH_BYTES // MAX_READ_BYTES) + [1],
+    ],
+    ids=["item-too-big", "negative", "one-bad-item", "batch-too-big"],
+)
+def test_read_batch_rejects_sizes(call, sizes):
+    reads = [{"path": "a", "size": s} for s in sizes]
+    resp, data = call({"cmd": "read-batch", "reads": reads})
+    assert resp == {"id": resp["id"], "ok": False, "error": "Tamanho de leitura invalido."}
+    assert data == b""
+    # validado antes de qualquer read chegar ao engine
+    assert call.engine.reads == []
+
+
+def test_read_rejects_size_over_limit(call):
+    resp, _ = call({"cmd": "read", "path": "a", "size": MAX_READ_BYTES + 1})
+    assert resp["error"] == "Tamanho de leitura invalido."
+    assert call.engine.reads == []
+    resp, data = call({"cmd": "read", "path": "a", "size": MAX_READ_BYTES})
+    assert resp["ok"] and len(data) == MAX_READ_BYTES
+
+
+@pytest.mark.parametrize("path", sorted(_ERRORS))
+def test_read_batch_item_errors_match_read(call, path):
+    single, _ = call({"cmd": "read", "path": path, "size": 1})
+    batch, _ = call({"cmd": "read-batch", "reads": [{"path": path, "size": 1}]})
+    assert not single["ok"]
+    assert batch["results"] == [{"ok": False, "error": single["error"]}]